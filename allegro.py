@@ -1,16 +1,307 @@
 import requests
 import time
+import json
+import random
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from pathlib import Path
 from dotenv import load_dotenv
 import os
+from job_store import JobStore
+from transport import get_transport
+
+
+class CompletionHistory:
+    def __init__(self, path=None, max_samples=50):
+        """
+        Recent Allegro completion times, used to estimate how long a job takes
+
+        Args:
+            path (str or Path, optional): JSON file holding the samples (default: output/allegro_history.json)
+            max_samples (int): Number of most recent samples kept (default: 50)
+        """
+        if path is None:
+            output_dir = Path(__file__).parent / "output"
+            output_dir.mkdir(exist_ok=True)
+            path = output_dir / "allegro_history.json"
+        self.path = Path(path)
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        try:
+            self.samples = json.loads(self.path.read_text())[-max_samples:]
+        except (FileNotFoundError, ValueError):
+            self.samples = []
+
+    def record(self, duration):
+        """
+        Record how many seconds a job took from submission to a ready video
+
+        Args:
+            duration (float): Completion time in seconds
+        """
+        with self._lock:
+            self.samples = (self.samples + [round(duration, 1)])[-self.max_samples:]
+            temp_path = self.path.with_suffix(".tmp")
+            temp_path.write_text(json.dumps(self.samples))
+            os.replace(temp_path, self.path)
+
+    def quantile(self, q):
+        """
+        Completion time below which a share `q` of recorded jobs finished
+
+        Args:
+            q (float): Quantile between 0 and 1
+
+        Returns:
+            float: Seconds, or None without history
+        """
+        with self._lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class PollSchedule:
+    def __init__(self, history=None, min_interval=5, max_interval=30, backoff=1.5, jitter=0.2, first_check=15):
+        """
+        Decide when to check a job again
+
+        With history, the first check is delayed until the fastest recorded
+        jobs usually finish; after that checks start short and back off
+        exponentially. Without history the first check happens after
+        `first_check` seconds. Every delay gets random jitter so concurrent
+        jobs do not poll in lockstep.
+
+        Args:
+            history (CompletionHistory, optional): Recorded completion times
+            min_interval (float): Shortest delay between checks in seconds (default: 5)
+            max_interval (float): Longest delay between checks in seconds (default: 30)
+            backoff (float): Growth factor of the delay after each check (default: 1.5)
+            jitter (float): Relative random jitter applied to each delay (default: 0.2)
+            first_check (float): Delay before the first check without history (default: 15)
+        """
+        self.history = history
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.first_check = first_check
+
+    def next_delay(self, elapsed, checks):
+        """
+        Seconds to wait before the next check
+
+        Args:
+            elapsed (float): Seconds since the job was submitted
+            checks (int): Checks already made for the job
+
+        Returns:
+            float: Delay in seconds
+        """
+        earliest = self.history.quantile(0.1) if self.history else None
+        if earliest is None:
+            earliest = self.first_check
+
+        if elapsed < earliest - self.min_interval:
+            # Most jobs are not done yet, skip straight to when the fastest ones usually finish
+            delay = min(earliest - elapsed, 4 * self.max_interval)
+        else:
+            delay = min(self.min_interval * self.backoff ** checks, self.max_interval)
+
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def eta(self, elapsed):
+        """
+        Estimated seconds until the job finishes
+
+        Args:
+            elapsed (float): Seconds since the job was submitted
+
+        Returns:
+            float: Remaining seconds, or None without enough history
+        """
+        if not self.history:
+            return None
+        for q in (0.5, 0.9, 1.0):
+            expected = self.history.quantile(q)
+            if expected is None:
+                return None
+            if expected > elapsed:
+                return expected - elapsed
+        # Slower than every recorded job
+        return None
+
+
+class JobPoller:
+    def __init__(self, generator, store, deadline=900):
+        """
+        Single background thread that polls every outstanding Allegro job
+
+        Each tracked job has its own next-check time from the generator's
+        PollSchedule; the thread always sleeps until the earliest one, so any
+        number of waiting callers share one loop.
+
+        Args:
+            generator (VideoGenerator): Used for status checks, scheduling and history
+            store (JobStore): Durable job records updated as jobs progress
+            deadline (float): Seconds after submission (or resumption) to stop polling a job (default: 900)
+        """
+        self.generator = generator
+        self.store = store
+        self.deadline = deadline
+        self._jobs = {}
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def track(self, request_id, submitted_at=None, resumed=False):
+        """
+        Start polling a job, or join the existing poll for it
+
+        Args:
+            request_id (str): Request ID returned by Allegro
+            submitted_at (float, optional): time.time() of submission (default: now)
+            resumed (bool): Whether polling restarts for an older job, e.g. after a restart
+
+        Returns:
+            Future: Resolves to the video URL, or fails once the deadline passes
+        """
+        with self._condition:
+            state = self._jobs.get(request_id)
+            if state is None:
+                now = time.time()
+                submitted_at = submitted_at or now
+                deadline_at = submitted_at + self.deadline
+                if deadline_at <= now:
+                    # Give jobs resumed after their deadline a fresh window
+                    deadline_at = now + self.deadline
+                state = {
+                    'future': Future(),
+                    'submitted_at': submitted_at,
+                    'deadline_at': deadline_at,
+                    'resumed': resumed,
+                    'checks': 0,
+                    'next_check_at': now + self.generator.schedule.next_delay(now - submitted_at, 0)
+                }
+                self._jobs[request_id] = state
+                self._start()
+                self._condition.notify()
+            return state['future']
+
+    def progress(self, request_id):
+        """
+        Progress of a tracked job in the format used by progress callbacks
+
+        Args:
+            request_id (str): Request ID returned by Allegro
+
+        Returns:
+            dict: request_id, elapsed, eta, checks and next_check_in, or None if not tracked
+        """
+        with self._condition:
+            state = self._jobs.get(request_id)
+            if state is None:
+                return None
+            now = time.time()
+            elapsed = now - state['submitted_at']
+            return {
+                'request_id': request_id,
+                'elapsed': elapsed,
+                'eta': self.generator.schedule.eta(elapsed),
+                'checks': state['checks'],
+                'next_check_in': max(0, state['next_check_at'] - now)
+            }
+
+    def outstanding(self):
+        """
+        Request IDs currently being polled
+
+        Returns:
+            list: Request IDs
+        """
+        with self._condition:
+            return list(self._jobs)
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="allegro-job-poller", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._jobs:
+                    self._condition.wait()
+                request_id, state = min(self._jobs.items(), key=lambda item: item[1]['next_check_at'])
+                delay = state['next_check_at'] - time.time()
+                if delay > 0:
+                    # Woken early when a new job is tracked, then re-pick the earliest
+                    self._condition.wait(delay)
+                    continue
+
+            try:
+                self._check(request_id, state)
+            except Exception as e:
+                self._finish(request_id, error=Exception(f"Failed to poll video {request_id}: {str(e)}"))
+
+    def _check(self, request_id, state):
+        state['checks'] += 1
+        try:
+            video_url = self.generator.check_video_status(request_id)
+        except requests.exceptions.RequestException as e:
+            print(f"Check {state['checks']} of {request_id} failed: {str(e)}")
+            video_url = None
+
+        now = time.time()
+        elapsed = now - state['submitted_at']
+        if video_url:
+            self.store.update(request_id, status='completed', video_url=video_url, error=None,
+                              checks=state['checks'], completed_at=now)
+            if not state['resumed']:
+                self.generator.history.record(elapsed)
+            self._finish(request_id, video_url=video_url)
+        elif now >= state['deadline_at']:
+            error = f"Video not ready after {elapsed:.0f} seconds and {state['checks']} checks"
+            self.store.update(request_id, status='expired', error=error, checks=state['checks'])
+            self._finish(request_id, error=Exception(error))
+        else:
+            self.store.update(request_id, checks=state['checks'])
+            with self._condition:
+                state['next_check_at'] = now + self.generator.schedule.next_delay(elapsed, state['checks'])
+
+    def _finish(self, request_id, video_url=None, error=None):
+        with self._condition:
+            state = self._jobs.pop(request_id, None)
+        if state is None:
+            return
+        if error is not None:
+            state['future'].set_exception(error)
+        else:
+            state['future'].set_result(video_url)
+
 
 class VideoGenerator:
-    def __init__(self):
-        """Initialize the Video Generator with Allegro credentials"""
+    def __init__(self, transport=None, history=None, store=None, deadline=900):
+        """
+        Initialize the Video Generator with Allegro credentials
+
+        Args:
+            transport (Transport, optional): Pooled HTTP transport (default: shared transport)
+            history (CompletionHistory, optional): Completion times for ETA estimates
+                (default: output/allegro_history.json)
+            store (JobStore, optional): Durable job records (default: output/allegro_jobs.sqlite3)
+            deadline (float): Seconds after submission to stop polling a job (default: 900)
+        """
         load_dotenv()
         self.base_url = "https://api.rhymes.ai/v1"
         self.api_key = os.getenv('ALLEGRO_API_KEY')
-        
+        self.transport = transport or get_transport()
+        self.session = self.transport.session
+        self.history = history or CompletionHistory()
+        self.schedule = PollSchedule(self.history)
+        self.store = store or JobStore()
+        self.poller = JobPoller(self, self.store, deadline=deadline)
+
     def generate_video(self, prompt, num_steps=100, cfg_scale=7.5, seed=100000):
         """
         Generate a video using Allegro API
@@ -38,23 +329,21 @@ class VideoGenerator:
         }
 
         try:
-            response = requests.post(url, headers=headers, json=data)
+            response = self.session.post(url, headers=headers, json=data, timeout=self.transport.timeout)
             response.raise_for_status()
             return response.json().get('data')  # Returns the request ID
         except requests.exceptions.RequestException as e:
             raise Exception(f"Failed to generate video: {str(e)}")
 
-    def query_video_status(self, request_id, max_retries=10, wait_time=30):
+    def check_video_status(self, request_id):
         """
-        Query the status of a video generation task
-        
+        Check once whether a video generation task has finished
+
         Args:
             request_id (str): The request ID from generate_video
-            max_retries (int): Maximum number of retry attempts
-            wait_time (int): Time to wait between retries in seconds
-            
+
         Returns:
-            str: URL of the generated video
+            str: URL of the generated video, or None while it is still processing
         """
         url = f"{self.base_url}/videoQuery"
         headers = {
@@ -64,53 +353,207 @@ class VideoGenerator:
             "requestId": request_id
         }
 
-        for attempt in range(max_retries):
+        response = self.session.get(url, headers=headers, params=params, timeout=self.transport.timeout)
+        response.raise_for_status()
+        video_url = response.json().get('data')
+        if video_url and video_url.strip():
+            return video_url
+        return None
+
+    def query_video_status(self, request_id, max_retries=None, wait_time=None, deadline=900,
+                           progress_callback=None, submitted_at=None):
+        """
+        Poll a video generation task until it finishes or the deadline passes
+
+        Checks follow the adaptive PollSchedule unless `wait_time` is given.
+
+        Args:
+            request_id (str): The request ID from generate_video
+            max_retries (int, optional): Maximum number of checks (default: no limit)
+            wait_time (float, optional): Fixed time to wait between checks in seconds
+            deadline (float): Give up this many seconds after submission (default: 900)
+            progress_callback (callable, optional): Called with a dict of request_id, elapsed,
+                eta (seconds or None), checks and next_check_in while waiting
+            submitted_at (float, optional): time.time() when the job was submitted (default: now)
+
+        Returns:
+            str: URL of the generated video
+        """
+        submitted_at = submitted_at or time.time()
+        checks = 0
+
+        while max_retries is None or checks < max_retries:
+            elapsed = time.time() - submitted_at
+            if elapsed >= deadline:
+                break
+
+            delay = wait_time if wait_time is not None else self.schedule.next_delay(elapsed, checks)
+            delay = min(delay, max(0, deadline - elapsed))
+            self._wait(request_id, delay, submitted_at, checks, progress_callback)
+
+            checks += 1
             try:
-                response = requests.get(url, headers=headers, params=params)
-                response.raise_for_status()
-                data = response.json()
-                
-                video_url = data.get('data')
-                if video_url and video_url.strip():
+                video_url = self.check_video_status(request_id)
+                if video_url:
+                    self.history.record(time.time() - submitted_at)
                     return video_url
-                
-                print(f"Attempt {attempt + 1}/{max_retries}: Video still processing, waiting {wait_time} seconds...")
-                time.sleep(wait_time)
-                
+                print(f"Check {checks}: Video still processing ({time.time() - submitted_at:.0f}s elapsed)")
+
             except requests.exceptions.RequestException as e:
-                print(f"Attempt {attempt + 1}/{max_retries} failed: {str(e)}")
-                if attempt < max_retries - 1:
-                    time.sleep(wait_time)
-                continue
-        
-        raise Exception("Failed to get video URL after maximum retries")
+                print(f"Check {checks} failed: {str(e)}")
+
+        raise Exception(f"Failed to get video URL after {time.time() - submitted_at:.0f} seconds and {checks} checks")
+
+    def _wait(self, request_id, delay, submitted_at, checks, progress_callback, tick=2):
+        """Sleep until the next check, reporting progress every `tick` seconds"""
+        wake_at = time.time() + delay
+        while True:
+            remaining = wake_at - time.time()
+            if progress_callback:
+                elapsed = time.time() - submitted_at
+                progress_callback({
+                    'request_id': request_id,
+                    'elapsed': elapsed,
+                    'eta': self.schedule.eta(elapsed),
+                    'checks': checks,
+                    'next_check_in': max(0, remaining)
+                })
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, tick) if progress_callback else remaining)
+
+    def submit(self, prompt, num_steps=100, cfg_scale=7.5, seed=100000):
+        """
+        Submit a video generation task, record it in the job store and start polling it
+
+        Args:
+            prompt (str): Description of the video to generate
+            num_steps (int): Number of generation steps
+            cfg_scale (float): Configuration scale
+            seed (int): Random seed for generation
+
+        Returns:
+            str: Request ID for the video generation task
+        """
+        submitted_at = time.time()
+        request_id = self.generate_video(prompt, num_steps=num_steps, cfg_scale=cfg_scale, seed=seed)
+        self.store.add(
+            request_id,
+            prompt,
+            {"num_steps": num_steps, "cfg_scale": cfg_scale, "seed": seed},
+            submitted_at=submitted_at
+        )
+        self.poller.track(request_id, submitted_at=submitted_at)
+        return request_id
 
-    def create_video(self, prompt, wait_for_completion=True):
+    def resume(self, request_id):
+        """
+        Make sure a job is being polled, e.g. after a restart or from another session
+
+        Args:
+            request_id (str): Request ID returned by Allegro
+
+        Returns:
+            Future: Resolves to the video URL
+        """
+        job = self.store.get(request_id)
+        if job and job['status'] == 'completed':
+            future = Future()
+            future.set_result(job['video_url'])
+            return future
+
+        if job is None:
+            # Submitted elsewhere; start tracking it from now
+            self.store.add(request_id, "", {})
+            return self.poller.track(request_id, resumed=True)
+
+        if job['status'] != 'pending':
+            self.store.update(request_id, status='pending', error=None)
+        return self.poller.track(request_id, submitted_at=job['submitted_at'], resumed=True)
+
+    def resume_pending(self):
+        """
+        Resume polling every job the store still lists as pending
+
+        Returns:
+            list: Request IDs being polled
+        """
+        for job in self.store.pending():
+            self.resume(job['request_id'])
+        return self.poller.outstanding()
+
+    def await_video(self, request_id, timeout=None, progress_callback=None, tick=2):
+        """
+        Wait for a job to finish, resuming it first if needed
+
+        Args:
+            request_id (str): Request ID returned by Allegro
+            timeout (float, optional): Seconds to wait before giving up (default: until the job's deadline)
+            progress_callback (callable, optional): Receives progress dicts, see query_video_status
+            tick (float): Seconds between progress reports (default: 2)
+
+        Returns:
+            str: URL of the generated video
+        """
+        future = self.resume(request_id)
+        wait_until = time.time() + timeout if timeout is not None else None
+
+        while True:
+            try:
+                return future.result(timeout=tick)
+            except FutureTimeoutError:
+                if wait_until is not None and time.time() >= wait_until:
+                    raise Exception(f"Timed out waiting for video {request_id}")
+                progress = self.poller.progress(request_id)
+                if progress_callback and progress:
+                    progress_callback(progress)
+
+    def create_video(self, prompt, wait_for_completion=True, progress_callback=None):
         """
         Convenience method to generate and optionally wait for video completion
         
         Args:
             prompt (str): Description of the video to generate
             wait_for_completion (bool): Whether to wait for the video to complete
+            progress_callback (callable, optional): Receives progress dicts, see query_video_status
             
         Returns:
             tuple: (request_id, video_url if wait_for_completion is True)
         """
         try:
-            # Generate the video
-            request_id = self.generate_video(prompt)
+            # Generate the video; the shared poller tracks it from here on
+            request_id = self.submit(prompt)
             print(f"Video generation started with request ID: {request_id}")
             
             if wait_for_completion:
-                # Wait for initial processing
-                print("Waiting 2 minutes for initial processing...")
-                time.sleep(120)
-                
-                # Query for video URL
-                video_url = self.query_video_status(request_id)
+                video_url = self.await_video(request_id, progress_callback=progress_callback)
                 return request_id, video_url
             
             return request_id, None
             
         except Exception as e:
-            raise Exception(f"Failed to create video: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Failed to create video: {str(e)}")
+
+
+_default_generator = None
+_default_generator_lock = threading.Lock()
+
+
+def get_video_generator():
+    """
+    Get the process-wide VideoGenerator, creating it on first use
+
+    Every caller shares one job poller and one completion history, so a
+    job is only polled once however many pages track it. Jobs still
+    pending from an earlier run are resumed when the generator is created.
+
+    Returns:
+        VideoGenerator: Shared generator
+    """
+    global _default_generator
+    with _default_generator_lock:
+        if _default_generator is None:
+            _default_generator = VideoGenerator()
+            # Keep polling jobs that were still running when the app last stopped
+            _default_generator.resume_pending()
+        return _default_generator
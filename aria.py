@@ -1,35 +1,156 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
+import asyncio
 import os
+import time
 from config import Config
+from response_cache import ResponseCache
+from transport import get_transport
 
-class AriaTextGenerator:
-    def __init__(self):
-        """Initialize the ARIA text generator with API credentials"""
-        load_dotenv()
-        self.client = OpenAI(
-            base_url=Config.ARIA_BASE_URL,
-            api_key=Config.ARIA_API_KEY
+
+class GenerationResult:
+    def __init__(self, text, usage=None, finish_reason=None, time_to_first_token=None, total_time=None, cached=False):
+        """
+        Final result of an ARIA generation
+
+        Args:
+            text (str): Generated text
+            usage (dict, optional): Token usage reported by the API
+            finish_reason (str, optional): Why the model stopped generating
+            time_to_first_token (float, optional): Seconds until the first text delta arrived
+            total_time (float, optional): Seconds until the generation finished
+            cached (bool): Whether the text was served from the response cache
+        """
+        self.text = text
+        self.usage = usage
+        self.finish_reason = finish_reason
+        self.time_to_first_token = time_to_first_token
+        self.total_time = total_time
+        self.cached = cached
+
+
+class AriaStream:
+    def __init__(self, chunks, started_at, error_message, on_complete=None):
+        """
+        Iterator over the text deltas of a streamed ARIA completion
+
+        Iterating yields text deltas as they arrive. Once the stream is
+        exhausted, `result` holds the GenerationResult with usage and timing.
+
+        Args:
+            chunks (iterable): Chunks returned by chat.completions.create(stream=True)
+            started_at (float): time.perf_counter() value when the request was sent
+            error_message (str): Prefix for errors raised while streaming
+            on_complete (callable, optional): Called with the GenerationResult when the stream ends
+        """
+        self._chunks = chunks
+        self._started_at = started_at
+        self._error_message = error_message
+        self._on_complete = on_complete
+        self.result = None
+
+    @classmethod
+    def from_result(cls, result):
+        """Wrap an already available result (e.g. a cache hit) as a single-delta stream"""
+        stream = cls(None, time.perf_counter(), None)
+        stream.result = result
+        return stream
+
+    def __iter__(self):
+        if self._chunks is None:
+            if self.result.text:
+                yield self.result.text
+            return
+
+        parts = []
+        usage = None
+        finish_reason = None
+        time_to_first_token = None
+
+        try:
+            for chunk in self._chunks:
+                if getattr(chunk, 'usage', None):
+                    usage = chunk.usage.model_dump()
+                if not chunk.choices:
+                    continue
+
+                choice = chunk.choices[0]
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+
+                delta = choice.delta.content if choice.delta else None
+                if not delta:
+                    continue
+
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - self._started_at
+                    # Leading whitespace would be stripped from the final text anyway
+                    delta = delta.lstrip()
+                    if not delta:
+                        time_to_first_token = None
+                        continue
+
+                parts.append(delta)
+                yield delta
+
+        except Exception as e:
+            raise Exception(f"{self._error_message}: {str(e)}")
+
+        self.result = GenerationResult(
+            text="".join(parts).strip(),
+            usage=usage,
+            finish_reason=finish_reason,
+            time_to_first_token=time_to_first_token,
+            total_time=time.perf_counter() - self._started_at
         )
+        if self._on_complete:
+            self._on_complete(self.result)
 
-    def generate_poem(self, options, verses=1, language="english"):
+    @property
+    def text(self):
+        """Full generated text, available once the stream is exhausted"""
+        return self.result.text if self.result else None
+
+
+class AriaBase:
+    def __init__(self, cache=None, use_cache=True):
         """
-        Generate a poem using ARIA
-        
+        Shared model settings, prompt building and caching for the ARIA clients
+
+        Args:
+            cache (ResponseCache, optional): Cache for poem responses (default: on-disk cache under cache/)
+            use_cache (bool): Set to False to disable response caching entirely
+        """
+        load_dotenv()
+        self.model = "aria"
+        self.sampling = {
+            "temperature": 0.6,
+            "top_p": 1,
+            "max_tokens": 1024,
+            "stop": ["<|im_end|>"]
+        }
+        if use_cache and cache is None:
+            cache = ResponseCache()
+        self.cache = cache if use_cache else None
+
+    def build_poem_prompt(self, options, verses=1, language="english"):
+        """
+        Build the prompt sent to ARIA for a poem
+
         Args:
             options (dict): Contains details like title, tone, style, and keywords.
             verses (int): Number of verses to generate (default: 1)
             language (str): Language for the poem (default: "english")
-            
+
         Returns:
-            str: Generated poem
+            str: Rendered prompt
         """
         title = options.get('title', 'a beautiful theme')
         tone = options.get('tone', 'reflective')
         style = options.get('style')
         keywords = options.get('keywords')
 
-        # Construct the initial prompt 
+        # Construct the initial prompt
         prompt = f"""
         Write a short, {verses}-verse poem about {title} in {language} language.
         The tone should be {tone}, with simple, evocative language.
@@ -41,65 +162,375 @@ class AriaTextGenerator:
         if keywords:
             prompt += f"\nUse the following keywords: {keywords}"
 
-        
+        return prompt
+
+    @staticmethod
+    def text_message(role, text):
+        """
+        Build a chat message in the format ARIA expects
+
+        Args:
+            role (str): "system", "user" or "assistant"
+            text (str): Message text
+
+        Returns:
+            dict: Chat message
+        """
+        return {
+            "role": role,
+            "content": [
+                {
+                    "type": "text",
+                    "text": text
+                }
+            ]
+        }
+
+    def _completion_params(self, messages, stream):
+        """Keyword arguments for a chat completion request"""
+        params = {}
+        if stream:
+            params["stream_options"] = {"include_usage": True}
+
+        return dict(
+            model=self.model,
+            messages=messages,
+            stream=stream,
+            **self.sampling,
+            **params
+        )
+
+    def _cache_key(self, prompt):
+        """Cache key covering the rendered prompt and every sampling parameter"""
+        return ResponseCache.make_key(prompt, model=self.model, **self.sampling)
+
+    def _cached_result(self, prompt, regenerate):
+        """Return the cached GenerationResult for a prompt, or None on a miss or bypass"""
+        if self.cache is None or regenerate:
+            return None
+        entry = self.cache.get(self._cache_key(prompt))
+        if entry is None:
+            return None
+        return GenerationResult(entry['text'], usage=entry['usage'], cached=True)
+
+    def _store_result(self, prompt, result):
+        """Save a freshly generated result in the cache"""
+        if self.cache is not None and result.text:
+            self.cache.set(self._cache_key(prompt), result.text, usage=result.usage)
+
+
+class AriaTextGenerator(AriaBase):
+    def __init__(self, cache=None, use_cache=True, transport=None):
+        """
+        Initialize the ARIA text generator with API credentials
+
+        Args:
+            cache (ResponseCache, optional): Cache for poem responses (default: on-disk cache under cache/)
+            use_cache (bool): Set to False to disable response caching entirely
+            transport (Transport, optional): Pooled HTTP transport (default: shared transport)
+        """
+        super().__init__(cache=cache, use_cache=use_cache)
+        self.transport = transport or get_transport()
+        self.client = OpenAI(
+            base_url=Config.ARIA_BASE_URL,
+            api_key=Config.ARIA_API_KEY,
+            http_client=self.transport.http_client
+        )
+
+    def _create_completion(self, messages, stream):
+        """Send a chat completion request for the given messages"""
+        return self.client.chat.completions.create(**self._completion_params(messages, stream))
+
+    def _stream(self, messages, error_message, on_complete=None):
+        """Start a streamed completion and wrap it in an AriaStream"""
         try:
-            response = self.client.chat.completions.create(
-                model="aria",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            }
-                        ]
-                    }
-                ],
-                stop=["<|im_end|>"],
-                stream=False,
-                temperature=0.6,
-                max_tokens=1024,
-                top_p=1
-            )
-            
-            return response.choices[0].message.content.strip()
-        
+            started_at = time.perf_counter()
+            chunks = self._create_completion(messages, stream=True)
+            return AriaStream(chunks, started_at, error_message, on_complete=on_complete)
+
+        except Exception as e:
+            raise Exception(f"{error_message}: {str(e)}")
+
+    def generate_poem(self, options, verses=1, language="english", regenerate=False):
+        """
+        Generate a poem using ARIA
+
+        Args:
+            options (dict): Contains details like title, tone, style, and keywords.
+            verses (int): Number of verses to generate (default: 1)
+            language (str): Language for the poem (default: "english")
+            regenerate (bool): Skip the cache lookup and request a fresh poem (default: False)
+
+        Returns:
+            str: Generated poem
+        """
+        prompt = self.build_poem_prompt(options, verses=verses, language=language)
+
+        cached = self._cached_result(prompt, regenerate)
+        if cached:
+            return cached.text
+
+        try:
+            response = self._create_completion([self.text_message("user", prompt)], stream=False)
+
+            poem = response.choices[0].message.content.strip()
+            usage = response.usage.model_dump() if response.usage else None
+            self._store_result(prompt, GenerationResult(poem, usage=usage))
+            return poem
+
         except Exception as e:
             raise Exception(f"Failed to generate poem: {str(e)}")
 
+    def stream_poem(self, options, verses=1, language="english", regenerate=False):
+        """
+        Generate a poem using ARIA, streaming text as it is produced
+
+        Args:
+            options (dict): Contains details like title, tone, style, and keywords.
+            verses (int): Number of verses to generate (default: 1)
+            language (str): Language for the poem (default: "english")
+            regenerate (bool): Skip the cache lookup and request a fresh poem (default: False)
+
+        Returns:
+            AriaStream: Iterator of text deltas; `result` is set once exhausted
+        """
+        prompt = self.build_poem_prompt(options, verses=verses, language=language)
+
+        cached = self._cached_result(prompt, regenerate)
+        if cached:
+            return AriaStream.from_result(cached)
+
+        return self._stream(
+            [self.text_message("user", prompt)],
+            "Failed to generate poem",
+            on_complete=lambda result: self._store_result(prompt, result)
+        )
+
     def generate_text(self, prompt):
         """
         Generate text using ARIA based on a custom prompt
-        
+
         Args:
             prompt (str): The text prompt for generation
-            
+
         Returns:
             str: Generated text
         """
+        return self.generate_chat([self.text_message("user", prompt)])
+
+    def stream_text(self, prompt):
+        """
+        Generate text using ARIA based on a custom prompt, streaming text as it is produced
+
+        Args:
+            prompt (str): The text prompt for generation
+
+        Returns:
+            AriaStream: Iterator of text deltas; `result` is set once exhausted
+        """
+        return self.stream_chat([self.text_message("user", prompt)])
+
+    def generate_chat(self, messages):
+        """
+        Generate a reply to a multi-turn conversation
+
+        Args:
+            messages (list): Chat messages, e.g. from ConversationContext.build_messages
+
+        Returns:
+            str: Generated reply
+        """
         try:
-            response = self.client.chat.completions.create(
-                model="aria",
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": prompt
-                            }
-                        ]
-                    }
-                ],
-                stop=["<|im_end|>"],
-                stream=False,
-                temperature=0.6,
-                max_tokens=1024,
-                top_p=1
-            )
-            
+            response = self._create_completion(messages, stream=False)
+
             return response.choices[0].message.content.strip()
-        
+
+        except Exception as e:
+            raise Exception(f"Failed to generate text: {str(e)}")
+
+    def stream_chat(self, messages):
+        """
+        Generate a reply to a multi-turn conversation, streaming text as it is produced
+
+        Args:
+            messages (list): Chat messages, e.g. from ConversationContext.build_messages
+
+        Returns:
+            AriaStream: Iterator of text deltas; `result` is set once exhausted
+        """
+        return self._stream(messages, "Failed to generate text")
+
+
+class BatchItem:
+    def __init__(self, index, options, result=None, error=None, elapsed=0.0):
+        """
+        Outcome of one entry of a batch generation
+
+        Args:
+            index (int): Position of the entry in the input list
+            options (dict): Poem options the entry was generated from
+            result (GenerationResult, optional): Generated poem, None if the entry failed
+            error (str, optional): Error message if the entry failed
+            elapsed (float): Seconds spent on the entry, including waiting for a slot
+        """
+        self.index = index
+        self.options = options
+        self.result = result
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class BatchResult:
+    def __init__(self, items, wall_time, concurrency):
+        """
+        Results of a batch generation, in input order
+
+        Args:
+            items (list): BatchItem per input entry, in input order
+            wall_time (float): Seconds the whole batch took
+            concurrency (int): Maximum number of requests that were in flight at once
+        """
+        self.items = items
+        self.wall_time = wall_time
+        self.concurrency = concurrency
+
+    @property
+    def poems(self):
+        """Generated poems in input order, None for failed entries"""
+        return [item.result.text if item.ok else None for item in self.items]
+
+    @property
+    def failures(self):
+        """BatchItems that failed"""
+        return [item for item in self.items if not item.ok]
+
+    @property
+    def stats(self):
+        """
+        Throughput statistics for the batch
+
+        Token counts, token throughput and latency only cover poems generated
+        in this batch; cached poems cost no tokens and are counted separately.
+
+        Returns:
+            dict: Counts, wall time, poems per second and token throughput
+        """
+        succeeded = [item for item in self.items if item.ok]
+        generated = [item for item in succeeded if not item.result.cached]
+        completion_tokens = sum(
+            (item.result.usage or {}).get('completion_tokens') or 0 for item in generated
+        )
+        latencies = sorted(item.result.total_time for item in generated if item.result.total_time is not None)
+        return {
+            'total': len(self.items),
+            'succeeded': len(succeeded),
+            'failed': len(self.items) - len(succeeded),
+            'cached': len(succeeded) - len(generated),
+            'concurrency': self.concurrency,
+            'wall_time': self.wall_time,
+            'poems_per_second': len(succeeded) / self.wall_time if self.wall_time else 0.0,
+            'completion_tokens': completion_tokens,
+            'tokens_per_second': completion_tokens / self.wall_time if self.wall_time else 0.0,
+            'median_latency': latencies[len(latencies) // 2] if latencies else None
+        }
+
+
+class AsyncAriaTextGenerator(AriaBase):
+    def __init__(self, cache=None, use_cache=True, transport=None):
+        """
+        Initialize the asynchronous ARIA text generator with API credentials
+
+        Args:
+            cache (ResponseCache, optional): Cache for poem responses (default: on-disk cache under cache/)
+            use_cache (bool): Set to False to disable response caching entirely
+            transport (Transport, optional): Pooled HTTP transport (default: shared transport)
+        """
+        super().__init__(cache=cache, use_cache=use_cache)
+        self.transport = transport or get_transport()
+        self.client = AsyncOpenAI(
+            base_url=Config.ARIA_BASE_URL,
+            api_key=Config.ARIA_API_KEY,
+            http_client=self.transport.create_async_http_client()
+        )
+
+    async def generate_poem(self, options, verses=1, language="english", regenerate=False):
+        """
+        Generate a poem using ARIA
+
+        Args:
+            options (dict): Contains details like title, tone, style, and keywords.
+            verses (int): Number of verses to generate (default: 1)
+            language (str): Language for the poem (default: "english")
+            regenerate (bool): Skip the cache lookup and request a fresh poem (default: False)
+
+        Returns:
+            GenerationResult: Generated poem with usage and timing
+        """
+        prompt = self.build_poem_prompt(options, verses=verses, language=language)
+
+        cached = self._cached_result(prompt, regenerate)
+        if cached:
+            return cached
+
+        try:
+            started_at = time.perf_counter()
+            response = await self.client.chat.completions.create(
+                **self._completion_params([self.text_message("user", prompt)], stream=False)
+            )
+
+            choice = response.choices[0]
+            result = GenerationResult(
+                choice.message.content.strip(),
+                usage=response.usage.model_dump() if response.usage else None,
+                finish_reason=choice.finish_reason,
+                total_time=time.perf_counter() - started_at
+            )
+            self._store_result(prompt, result)
+            return result
+
         except Exception as e:
-            raise Exception(f"Failed to generate text: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Failed to generate poem: {str(e)}")
+
+    async def generate_poems(self, options_list, concurrency=8, verses=1, language="english", regenerate=False):
+        """
+        Generate many poems with at most `concurrency` requests in flight
+
+        A failing entry is recorded in its BatchItem and does not abort the rest of the batch.
+
+        Args:
+            options_list (list): Poem options dicts; an entry may override 'verses' and 'language'
+            concurrency (int): Maximum number of concurrent requests (default: 8)
+            verses (int): Default number of verses (default: 1)
+            language (str): Default language (default: "english")
+            regenerate (bool): Skip cache lookups for every entry (default: False)
+
+        Returns:
+            BatchResult: Per-entry results in input order plus throughput stats
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def run(index, options):
+            started_at = time.perf_counter()
+            async with semaphore:
+                try:
+                    result = await self.generate_poem(
+                        options,
+                        verses=options.get('verses', verses),
+                        language=options.get('language', language),
+                        regenerate=regenerate
+                    )
+                    return BatchItem(index, options, result=result, elapsed=time.perf_counter() - started_at)
+                except Exception as e:
+                    return BatchItem(index, options, error=str(e), elapsed=time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        items = await asyncio.gather(*(run(index, options) for index, options in enumerate(options_list)))
+        return BatchResult(list(items), time.perf_counter() - started_at, concurrency)
+
+    async def close(self):
+        """Close the underlying HTTP client"""
+        await self.client.close()
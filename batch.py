@@ -0,0 +1,180 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from file_cache import cache_key
+from pipeline import build_poem_video_pipeline
+
+# Default number of concurrent calls per pipeline stage
+DEFAULT_LIMITS = {
+    "poem": 4,
+    "speech": 4,
+    "video": 8,
+    "download": 4,
+    "edit": 2
+}
+
+POEM_OPTION_KEYS = ("title", "tone", "style", "keywords")
+
+
+def load_jobs(path):
+    """
+    Read job specs from a JSONL file
+
+    Each non-empty line is an object with poem options (either under
+    "options" or as top-level title/tone/style/keywords) and optional
+    "id", "poem", "verses", "language", "voice", "video_prompt" and "captions" keys.
+
+    Args:
+        path (str or Path): JSONL job file
+
+    Returns:
+        list: Job dicts, each with a stable 'id'
+    """
+    jobs = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                spec = json.loads(line)
+            except ValueError as e:
+                raise Exception(f"Invalid job on line {line_number} of {path}: {str(e)}")
+            # Jobs without an explicit id are identified by their content, so reruns match up
+            spec.setdefault("id", cache_key(spec)[:16])
+            jobs.append(spec)
+    return jobs
+
+
+class BatchRunner:
+    def __init__(self, components, manifest_path, limits=None, workers=None, output_dir=None):
+        """
+        Run many poem-to-video jobs with per-stage concurrency limits
+
+        Every finished job appends one line to the manifest. Jobs already
+        recorded as completed there are skipped, so an interrupted run can
+        simply be restarted.
+
+        Args:
+            components (dict): Pipeline components, see build_poem_video_pipeline
+            manifest_path (str or Path): JSONL manifest of artifacts and timings
+            limits (dict, optional): Stage name -> maximum concurrent calls (default: DEFAULT_LIMITS)
+            workers (int, optional): Jobs in progress at once (default: sum of the stage limits)
+            output_dir (str or Path, optional): Directory for final videos (default: output/batch)
+        """
+        self.components = components
+        self.manifest_path = Path(manifest_path)
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.workers = workers or sum(self.limits.values())
+        self.output_dir = Path(output_dir) if output_dir else Path(__file__).parent / "output" / "batch"
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._semaphores = {name: threading.Semaphore(limit) for name, limit in self.limits.items()}
+        if 'videos' in components:
+            # With a VideoCache, downloads happen inside the video stage, so the cache
+            # applies the download limit itself
+            components['videos'].download_limit = self._semaphores['download']
+        self._manifest_lock = threading.Lock()
+
+    def completed_ids(self):
+        """
+        IDs of jobs the manifest records as completed
+
+        Returns:
+            set: Job IDs
+        """
+        completed = set()
+        if not self.manifest_path.exists():
+            return completed
+        with open(self.manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by an interrupted run
+                    continue
+                if entry.get("status") == "completed":
+                    completed.add(entry["id"])
+        return completed
+
+    def _record(self, entry):
+        with self._manifest_lock:
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+
+    def run_job(self, job):
+        """
+        Run one job through the pipeline and record it in the manifest
+
+        Args:
+            job (dict): Job spec from load_jobs
+
+        Returns:
+            dict: Manifest entry
+        """
+        options = job.get("options") or {key: job[key] for key in POEM_OPTION_KEYS if key in job}
+        pipeline = build_poem_video_pipeline(
+            self.components,
+            options=options,
+            poem=job.get("poem"),
+            verses=job.get("verses", 1),
+            language=job.get("language", "english"),
+            voice=job.get("voice", "onyx"),
+            video_prompt=job.get("video_prompt"),
+            video_filename=f"{job['id']}_background.mp4",
+            output_path=str(self.output_dir / f"{job['id']}.mp4"),
+            limits=self._semaphores,
+            captions=job.get("captions", False)
+        )
+
+        started_at = time.time()
+        try:
+            result = pipeline.run()
+            entry = {
+                "id": job["id"],
+                "status": "completed",
+                "artifacts": result.results,
+                "timings": result.timings,
+                "wall_time": result.wall_time
+            }
+        except Exception as e:
+            entry = {
+                "id": job["id"],
+                "status": "failed",
+                "error": str(e),
+                "wall_time": time.time() - started_at
+            }
+
+        entry["finished_at"] = time.time()
+        self._record(entry)
+        return entry
+
+    def run(self, jobs):
+        """
+        Run every job that is not yet completed
+
+        Args:
+            jobs (list): Job specs from load_jobs
+
+        Returns:
+            dict: Counts of completed, failed and skipped jobs plus the wall time
+        """
+        done = self.completed_ids()
+        todo = [job for job in jobs if job["id"] not in done]
+        skipped = len(jobs) - len(todo)
+        if skipped:
+            print(f"Skipping {skipped} jobs already completed in {self.manifest_path}")
+
+        started_at = time.time()
+        counts = {"completed": 0, "failed": 0}
+        with ThreadPoolExecutor(max_workers=max(1, self.workers)) as executor:
+            futures = [executor.submit(self.run_job, job) for job in todo]
+            for index, future in enumerate(as_completed(futures), start=1):
+                entry = future.result()
+                counts[entry["status"]] += 1
+                detail = entry.get("error") or f"{entry['wall_time']:.0f}s"
+                print(f"[{index}/{len(todo)}] {entry['id']} {entry['status']} ({detail})")
+
+        return {**counts, "skipped": skipped, "wall_time": time.time() - started_at}
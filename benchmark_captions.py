@@ -0,0 +1,69 @@
+import argparse
+import math
+import time
+import cv2
+import numpy as np
+from captions import CaptionOverlay, CaptionTrack
+from frames import FrameSpool, ping_pong_indices, timeline_indices
+
+SAMPLE_POEM = """Beneath the silver birches, rivers hum
+A quiet song of stones worn smooth by time
+The evening sky lets all its colours come
+And settle on the water, line by line
+
+The wind keeps counting leaves it cannot hold
+The heron waits where shallow currents bend
+And every branch the sunset turns to gold
+Remembers how the morning will descend"""
+
+
+def per_frame_composite(frames, times, track, width, height):
+    """The per-frame approach: draw the current line's text and blend it for every frame"""
+    font_scale = round(1.1 * height / 720, 2)
+    thickness = max(1, round(font_scale * 2))
+    for frame, t in zip(frames, times):
+        line = np.searchsorted(track.starts, t, side="right") - 1
+        if line < 0 or t >= track.ends[line]:
+            continue
+        text = track.lines[line]
+        mask = np.zeros((height, width), dtype=np.uint8)
+        (text_width, _), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_DUPLEX, font_scale, thickness)
+        origin = ((width - text_width) // 2, int(height * 0.9))
+        cv2.putText(mask, text, origin, cv2.FONT_HERSHEY_DUPLEX, font_scale, 255, thickness, cv2.LINE_AA)
+        alpha = mask[..., None].astype(np.float32) / 255
+        frame[:] = (frame * (1 - alpha) + 255 * alpha).astype(np.uint8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure caption compositing speed")
+    parser.add_argument("--video", default="videos/poetry_background.mp4", help="Source clip")
+    parser.add_argument("--seconds", type=float, default=30, help="Length of the captioned timeline (default: 30)")
+    args = parser.parse_args()
+
+    with FrameSpool(args.video) as spool:
+        indices = timeline_indices(ping_pong_indices(spool.frame_count), math.ceil(args.seconds * spool.fps))
+        track = CaptionTrack.from_text(SAMPLE_POEM, args.seconds)
+        print(f"{len(indices)} frames of {spool.width}x{spool.height}, {len(track.lines)} caption lines")
+
+        def timed(label, composite):
+            # Only the compositing is timed; reading frames is common to both
+            elapsed = 0.0
+            done = 0
+            for block in spool.gather(indices):
+                times = np.arange(done, done + len(block)) / spool.fps
+                started = time.perf_counter()
+                composite(block, times)
+                elapsed += time.perf_counter() - started
+                done += len(block)
+            print(f"{label:<32} {elapsed:7.2f}s  {done / elapsed:8.1f} frames/s")
+            return elapsed
+
+        per_frame = timed("per-frame draw and blend",
+                          lambda block, times: per_frame_composite(block, times, track, spool.width, spool.height))
+        overlay = CaptionOverlay(track, spool.width, spool.height)
+        batched = timed("cached tiles, batched blend", overlay.apply)
+        print(f"speedup: {per_frame / batched:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import argparse
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+from tqdm import tqdm
+from media_store import MediaStore
+from video_downloader import VideoDownloader
+
+
+class RangeFileHandler(BaseHTTPRequestHandler):
+    """
+    Serves one file, optionally with Range support and a per-connection rate limit
+
+    It can also cut the first response short to simulate a dropped connection.
+    """
+    file_path = None
+    drop_after = None
+    dropped = False
+    ranges = True
+    rate = None  # bytes per second per connection
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        size = os.path.getsize(self.file_path)
+        start, end = 0, size - 1
+        match = self.ranges and re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else end
+            if start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes" if self.ranges else "none")
+        self.send_header("ETag", '"benchmark"')
+        self.end_headers()
+
+        remaining = end - start + 1
+        if self.drop_after and not RangeFileHandler.dropped:
+            RangeFileHandler.dropped = True
+            remaining = min(remaining, self.drop_after)
+        block = 64 * 1024 if self.rate else 1024 * 1024
+        started = time.perf_counter()
+        sent = 0
+        with open(self.file_path, "rb") as f:
+            f.seek(start)
+            while remaining > 0:
+                data = f.read(min(block, remaining))
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client hung up, e.g. after a range probe that got the whole file
+                    return
+                remaining -= len(data)
+                sent += len(data)
+                if self.rate:
+                    ahead = sent / self.rate - (time.perf_counter() - started)
+                    if ahead > 0:
+                        time.sleep(ahead)
+        if RangeFileHandler.dropped and self.drop_after:
+            self.close_connection = True
+
+
+def legacy_download(session, url, path):
+    """The previous download loop: 1 KiB iter_content chunks with a tqdm update each"""
+    response = session.get(url, stream=True)
+    response.raise_for_status()
+    total_size = int(response.headers.get('content-length', 0))
+    with open(path, 'wb') as file, tqdm(total=total_size, unit='iB', unit_scale=True,
+                                        unit_divisor=1024, disable=True) as progress_bar:
+        for data in response.iter_content(chunk_size=1024):
+            progress_bar.update(file.write(data))
+
+
+def timed(label, size, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {elapsed:7.2f}s  {size / elapsed / (1024 * 1024):8.1f} MiB/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare download throughput against a local file server")
+    parser.add_argument("--size-mb", type=int, default=256, help="Size of the served file (default: 256)")
+    parser.add_argument("--rate-mb", type=float, default=20,
+                        help="Per-connection limit for the segmented runs in MiB/s (default: 20)")
+    parser.add_argument("--segments", type=int, default=8, help="Connections for the segmented run (default: 8)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "source.mp4"
+        size = args.size_mb * 1024 * 1024
+        with open(source, "wb") as f:
+            f.write(os.urandom(size))
+
+        RangeFileHandler.file_path = source
+        server = ThreadingHTTPServer(("127.0.0.1", 0), RangeFileHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/source.mp4"
+
+        downloader = VideoDownloader(store=MediaStore(Path(tmp) / "store"))
+        downloader.output_dir = Path(tmp)
+        quiet = lambda done, total: None
+
+        print(f"Downloading {args.size_mb} MiB from {url}")
+        legacy = timed("legacy iter_content(1024)", size,
+                       lambda: legacy_download(downloader.session, url, Path(tmp) / "legacy.mp4"))
+        adaptive = timed("adaptive chunks, callback", size,
+                         lambda: downloader.download_video(url, "adaptive.mp4", progress_callback=quiet,
+                                                           segments=1))
+        print(f"speedup: {legacy / adaptive:.1f}x")
+
+        # Cut the first response at a third of the file and let the downloader resume it
+        RangeFileHandler.drop_after = size // 3
+        timed("adaptive with one dropped connection", size,
+              lambda: downloader.download_video(url, "resumed.mp4", progress_callback=quiet, segments=1))
+        same = (Path(tmp) / "resumed.mp4").read_bytes() == source.read_bytes()
+        print(f"resumed file matches source: {same}")
+        RangeFileHandler.drop_after = None
+
+        # A bandwidth-limited connection, as with a remote CDN: one stream vs several ranges
+        RangeFileHandler.rate = args.rate_mb * 1024 * 1024
+        print(f"\nPer-connection limit {args.rate_mb:g} MiB/s")
+        single = timed("single stream", size,
+                       lambda: downloader.download_video(url, "single.mp4", progress_callback=quiet, segments=1))
+        segmented = timed(f"{args.segments} segments", size,
+                          lambda: downloader.download_video(url, "segmented.mp4", progress_callback=quiet,
+                                                            segments=args.segments))
+        print(f"speedup: {single / segmented:.1f}x")
+        same = (Path(tmp) / "segmented.mp4").read_bytes() == source.read_bytes()
+        print(f"segmented file matches source: {same}")
+
+        # Without range support the segmented mode falls back to a single stream
+        RangeFileHandler.ranges = False
+        timed("segments requested, no ranges", size,
+              lambda: downloader.download_video(url, "fallback.mp4", progress_callback=quiet,
+                                                segments=args.segments))
+        same = (Path(tmp) / "fallback.mp4").read_bytes() == source.read_bytes()
+        print(f"fallback file matches source: {same}")
+
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
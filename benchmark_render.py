@@ -0,0 +1,56 @@
+import argparse
+import math
+import os
+import tempfile
+import time
+from frames import FrameSpool, ping_pong_indices, seamless_loop_indices, timeline_indices
+from video_editor import VideoEditor
+
+
+def worker_counts(limit):
+    counts = [1]
+    while counts[-1] * 2 <= limit:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != limit:
+        counts.append(limit)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure segmented render speedup against worker count")
+    parser.add_argument("--video", default="videos/poetry_background.mp4", help="Source clip")
+    parser.add_argument("--seconds", type=float, default=60,
+                        help="Length of the full-timeline render, as for a narration (default: 60)")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1,
+                        help="Largest worker count to try (default: number of cores)")
+    args = parser.parse_args()
+
+    editor = VideoEditor()
+    print(f"{os.cpu_count()} cores, source {args.video}")
+
+    with FrameSpool(args.video, directory=editor.output_dir) as spool, tempfile.TemporaryDirectory() as tmp:
+        unit = ping_pong_indices(spool.frame_count)
+        timeline = timeline_indices(unit, math.ceil(args.seconds * spool.fps))
+        seamless = seamless_loop_indices(spool, crossfade_frames=round(0.25 * spool.fps))
+        jobs = [
+            (f"loop unit ({len(unit)} frames)", unit),
+            (f"{args.seconds:g}s timeline ({len(timeline)} frames)", timeline),
+        ]
+        if seamless is not None:
+            jobs.insert(1, (f"seamless loop unit ({len(seamless)} frames)", seamless))
+
+        for label, indices in jobs:
+            print(f"\n{label}")
+            baseline = None
+            for workers in worker_counts(args.max_workers):
+                output_path = os.path.join(tmp, f"render_{workers}.mp4")
+                started = time.perf_counter()
+                editor.encode_frames(spool, indices, output_path, workers=workers)
+                elapsed = time.perf_counter() - started
+                baseline = baseline or elapsed
+                fps = len(indices) / elapsed
+                print(f"  {workers:>3} workers  {elapsed:7.2f}s  {fps:7.1f} frames/s  speedup {baseline / elapsed:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
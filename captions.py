@@ -0,0 +1,240 @@
+import functools
+import re
+import cv2
+import numpy as np
+
+CAPTION_FONT = cv2.FONT_HERSHEY_DUPLEX
+
+# Caption text height relative to a 720p frame, and how far above the bottom edge it sits
+CAPTION_SCALE_720P = 1.1
+CAPTION_MARGIN = 0.08
+
+
+def can_render(text):
+    """
+    Whether captions can show this text
+
+    The Hershey fonts cv2.putText draws with only cover printable ASCII, and
+    it lays glyphs out left to right without shaping, so Urdu and other
+    non-Latin text would come out as question marks.
+
+    Args:
+        text (str): Caption text
+
+    Returns:
+        bool: True if every character can be drawn
+    """
+    return all(character.isascii() and (character.isprintable() or character.isspace()) for character in text)
+
+
+def caption_lines(text):
+    """Non-empty lines of a poem, stripped, in reading order"""
+    return [line.strip() for line in text.splitlines() if line.strip()]
+
+
+def _spoken_length(text):
+    """Characters that take time to read aloud; whitespace is ignored"""
+    return max(1, len(re.sub(r"\s+", "", text)))
+
+
+def line_timings(lines, duration, chunk_timings=None):
+    """
+    Work out when each caption line is spoken
+
+    Without chunk timings the narration is split across the lines in
+    proportion to their character counts. With them, each TTS chunk's
+    duration is spread over the characters of that chunk, so lines follow
+    pauses and pace changes between chunks.
+
+    Args:
+        lines (list): Caption lines in reading order
+        duration (float): Length of the narration in seconds
+        chunk_timings (list, optional): (chunk text, seconds) pairs covering the same text,
+            as from tts.speech_timings()
+
+    Returns:
+        tuple: (starts, ends) arrays of seconds, one entry per line
+    """
+    line_bounds = np.concatenate([[0], np.cumsum([_spoken_length(line) for line in lines])]).astype(np.float64)
+    if chunk_timings:
+        char_knots = np.concatenate([[0], np.cumsum([_spoken_length(chunk) for chunk, _ in chunk_timings])])
+        time_knots = np.concatenate([[0], np.cumsum([seconds for _, seconds in chunk_timings])])
+        # Absorb small differences in how the chunks and lines were trimmed, and any
+        # padding the audio encoder added
+        char_knots = char_knots * (line_bounds[-1] / char_knots[-1])
+        if time_knots[-1] > 0:
+            time_knots = time_knots * (duration / time_knots[-1])
+        times = np.interp(line_bounds, char_knots, time_knots)
+    else:
+        times = line_bounds / line_bounds[-1] * duration
+    return times[:-1], times[1:]
+
+
+@functools.lru_cache(maxsize=256)
+def render_line(text, max_width, font_scale, thickness):
+    """
+    Draw a caption line once as a premultiplied BGRA tile
+
+    Text wider than `max_width` is wrapped on word boundaries. Glyphs are
+    white with an anti-aliased black outline; the alpha channel is zero
+    outside them. Tiles are cached, so each line is drawn once however many
+    frames show it.
+
+    Args:
+        text (str): Caption line
+        max_width (int): Widest the tile may be in pixels
+        font_scale (float): cv2.putText font scale
+        thickness (int): Glyph stroke width in pixels
+
+    Returns:
+        np.ndarray: Read-only uint8 array of shape (height, width, 4)
+    """
+    outline = max(1, thickness)
+    words = text.split()
+    rows = []
+    for word in words:
+        candidate = f"{rows[-1]} {word}" if rows else word
+        width = cv2.getTextSize(candidate, CAPTION_FONT, font_scale, thickness)[0][0] + 2 * outline
+        if rows and width > max_width:
+            rows.append(word)
+        elif rows:
+            rows[-1] = candidate
+        else:
+            rows.append(word)
+
+    (_, text_height), baseline = cv2.getTextSize("Ag", CAPTION_FONT, font_scale, thickness)
+    row_height = text_height + baseline + 2 * outline
+    widths = [cv2.getTextSize(row, CAPTION_FONT, font_scale, thickness)[0][0] for row in rows]
+    tile_width = min(max_width, max(widths) + 2 * outline)
+    tile_height = row_height * len(rows)
+
+    fill = np.zeros((tile_height, tile_width), dtype=np.uint8)
+    for index, (row, width) in enumerate(zip(rows, widths)):
+        origin = (max(outline, (tile_width - width) // 2), (index + 1) * row_height - baseline - outline)
+        cv2.putText(fill, row, origin, CAPTION_FONT, font_scale, 255, thickness, cv2.LINE_AA)
+    # Thicker strokes also widen the glyph advance, so the outline is grown from the fill instead
+    edge = cv2.dilate(fill, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * outline + 1, 2 * outline + 1)))
+
+    tile = np.empty((tile_height, tile_width, 4), dtype=np.uint8)
+    tile[..., :3] = fill[..., None]
+    tile[..., 3] = np.maximum(edge, fill)
+    tile.setflags(write=False)
+    return tile
+
+
+class CaptionTrack:
+    def __init__(self, lines, starts, ends):
+        """
+        Caption lines and when each one is shown
+
+        Args:
+            lines (list): Caption lines in reading order
+            starts (sequence): Start of each line in seconds
+            ends (sequence): End of each line in seconds
+        """
+        self.lines = list(lines)
+        self.starts = np.asarray(starts, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+
+    @classmethod
+    def from_text(cls, text, duration, chunk_timings=None):
+        """
+        Time the lines of a poem against its narration, see line_timings()
+
+        Args:
+            text (str): Poem text, one caption per line
+            duration (float): Length of the narration in seconds
+            chunk_timings (list, optional): (chunk text, seconds) pairs from tts.speech_timings()
+
+        Returns:
+            CaptionTrack: Timed captions
+        """
+        lines = caption_lines(text)
+        if not lines:
+            raise ValueError("Caption text has no lines")
+        if not can_render(text):
+            raise ValueError("Captions can only show Latin text without accents")
+        starts, ends = line_timings(lines, duration, chunk_timings)
+        return cls(lines, starts, ends)
+
+    def key(self):
+        """Cache key part covering the text and timing"""
+        return (self.lines, np.round(self.starts, 3).tolist(), np.round(self.ends, 3).tolist())
+
+
+class CaptionOverlay:
+    def __init__(self, track, width, height, fade=0.25):
+        """
+        Composite a caption track onto frames of one size
+
+        Every line is drawn once into a tile, which is converted to float
+        colour and alpha ahead of time. apply() then blends whole blocks of
+        frames showing the same line in one NumPy operation.
+
+        Args:
+            track (CaptionTrack): Timed captions
+            width (int): Frame width in pixels
+            height (int): Frame height in pixels
+            fade (float): Seconds each line takes to fade in and out (default: 0.25)
+        """
+        self.track = track
+        self.fade = fade
+        font_scale = round(CAPTION_SCALE_720P * height / 720, 2)
+        thickness = max(1, round(font_scale * 2))
+        max_width = int(width * 0.9)
+
+        self._tiles = []
+        for line in track.lines:
+            tile = render_line(line, max_width, font_scale, thickness)
+            tile_height, tile_width = tile.shape[:2]
+            top = max(0, height - int(height * CAPTION_MARGIN) - tile_height)
+            left = max(0, (width - tile_width) // 2)
+            alpha = tile[:height - top, :width - left, 3:].astype(np.float32) / 255
+            color = tile[:height - top, :width - left, :3].astype(np.float32)
+            self._tiles.append((slice(top, top + alpha.shape[0]), slice(left, left + alpha.shape[1]), color, alpha))
+
+    def weights(self, times):
+        """
+        Which line each frame shows and how opaque it is
+
+        Args:
+            times (np.ndarray): Timestamp of each frame in seconds
+
+        Returns:
+            tuple: (line index, opacity) arrays; the index is -1 where no line is shown
+        """
+        times = np.asarray(times, dtype=np.float64)
+        lines = np.searchsorted(self.track.starts, times, side="right") - 1
+        clipped = np.clip(lines, 0, len(self.track.lines) - 1)
+        starts, ends = self.track.starts[clipped], self.track.ends[clipped]
+        shown = (lines >= 0) & (times < ends)
+        if self.fade > 0:
+            opacity = np.clip(np.minimum(times - starts, ends - times) / self.fade, 0, 1)
+        else:
+            opacity = np.ones_like(times)
+        opacity = np.where(shown, opacity, 0).astype(np.float32)
+        return np.where(shown & (opacity > 0), lines, -1), opacity
+
+    def apply(self, frames, times):
+        """
+        Burn the captions into a block of frames in place
+
+        Args:
+            frames (np.ndarray): uint8 frames of shape (n, height, width, 3)
+            times (np.ndarray): Timestamp of each frame in seconds
+
+        Returns:
+            np.ndarray: frames
+        """
+        lines, opacity = self.weights(times)
+        for line in np.unique(lines[lines >= 0]):
+            rows = np.nonzero(lines == line)[0]
+            rows_slice = slice(rows[0], rows[-1] + 1) if rows[-1] - rows[0] + 1 == len(rows) else rows
+            y, x, color, alpha = self._tiles[line]
+            weight = opacity[rows][:, None, None, None]
+            region = frames[rows_slice, y, x].astype(np.float32)
+            # out = frame * (1 - a) + colour * a, with colour already multiplied by a
+            region *= 1 - alpha * weight
+            region += color * weight
+            frames[rows_slice, y, x] = region + 0.5
+        return frames
@@ -9,3 +9,16 @@ class Config:
     ARIA_API_KEY=os.environ.get('ARIA_API_KEY')
     ALLEGRO_API_KEY=os.environ.get('ALLEGRO_API_KEY')
     OPENAI_API_KEY=os.environ.get('OPENAI_API_KEY')
+
+    # Shared HTTP transport settings
+    HTTP_MAX_CONNECTIONS=int(os.environ.get('HTTP_MAX_CONNECTIONS', 20))
+    HTTP_MAX_KEEPALIVE=int(os.environ.get('HTTP_MAX_KEEPALIVE', 10))
+    HTTP_CONNECT_TIMEOUT=float(os.environ.get('HTTP_CONNECT_TIMEOUT', 10))
+    HTTP_READ_TIMEOUT=float(os.environ.get('HTTP_READ_TIMEOUT', 120))
+    HTTP2=os.environ.get('HTTP2', 'false').lower() in ('1', 'true', 'yes')
+
+    # Concurrent Range requests per video download (1 = single stream)
+    DOWNLOAD_SEGMENTS=int(os.environ.get('DOWNLOAD_SEGMENTS', 4))
+
+    # Processes encoding segments of a render in parallel (default: one per core, 1 = single encode)
+    RENDER_WORKERS=int(os.environ.get('RENDER_WORKERS') or os.cpu_count() or 1)
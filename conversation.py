@@ -0,0 +1,144 @@
+from functools import lru_cache
+from aria import AriaBase
+
+# Rough characters-per-token ratio for English text with the ARIA tokenizer
+CHARS_PER_TOKEN = 4
+# Per-message overhead for role markers and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text):
+    """
+    Estimate the number of tokens in a piece of text
+
+    Results are cached per distinct text, so re-counting the history on
+    every turn only costs a dictionary lookup per message.
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Estimated token count
+    """
+    return MESSAGE_OVERHEAD_TOKENS + (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class ConversationContext:
+    def __init__(self, token_budget=3000, summary_tokens=400, summarizer=None, system_prompt=None, refill_ratio=0.6):
+        """
+        Select the part of a chat history that is sent to ARIA on each turn
+
+        The most recent turns are sent verbatim as long as they fit in the
+        token budget. Older turns are folded into a rolling summary (when a
+        summarizer is given) that is sent ahead of them, so the request size
+        stays bounded however long the conversation gets.
+
+        Args:
+            token_budget (int): Maximum estimated tokens sent per request (default: 3000)
+            summary_tokens (int): Target size of the rolling summary (default: 400)
+            summarizer (callable, optional): Takes a prompt and returns generated text,
+                e.g. AriaTextGenerator.generate_text. Without it older turns are dropped.
+            system_prompt (str, optional): Instructions sent at the start of every request
+            refill_ratio (float): Share of the history budget left in use after folding, so
+                the summarizer runs every few turns rather than on every turn (default: 0.6)
+        """
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer
+        self.system_prompt = system_prompt
+        self.refill_ratio = refill_ratio
+        self.summary = None
+        # Number of leading history messages already folded into the summary
+        self.summarized_count = 0
+
+    def reset(self):
+        """Forget the rolling summary, e.g. when the chat history is cleared"""
+        self.summary = None
+        self.summarized_count = 0
+
+    def _fixed_tokens(self, prompt):
+        """Tokens used by everything except the windowed history"""
+        tokens = count_tokens(prompt)
+        if self.system_prompt:
+            tokens += count_tokens(self.system_prompt)
+        if self.summary:
+            tokens += count_tokens(self._summary_text())
+        elif self.summarizer:
+            # Leave room for the summary that older turns will be folded into
+            tokens += self.summary_tokens
+        return tokens
+
+    def _summary_text(self):
+        return f"Summary of the earlier conversation:\n{self.summary}"
+
+    def _window_start(self, history, prompt, fill=1.0):
+        """Index of the oldest history message that still fits in `fill` of the history budget"""
+        available = (self.token_budget - self._fixed_tokens(prompt)) * fill
+        start = len(history)
+        while start > self.summarized_count:
+            cost = count_tokens(history[start - 1]["content"])
+            if cost > available:
+                break
+            available -= cost
+            start -= 1
+        return start
+
+    def _fold_into_summary(self, messages):
+        """Merge messages that left the window into the rolling summary"""
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        prompt = f"""
+        Summarize the conversation below in at most {self.summary_tokens * 3 // 4} words.
+        Keep names, facts, decisions and the user's preferences; drop small talk.
+        """
+        if self.summary:
+            prompt += f"\nSummary of the earlier conversation:\n{self.summary}"
+        prompt += f"\nNew messages:\n{transcript}"
+
+        self.summary = self.summarizer(prompt)
+
+    def build_messages(self, history, prompt):
+        """
+        Build the messages for the next request
+
+        Args:
+            history (list): Previous messages as {'role': str, 'content': str} dicts, oldest first
+            prompt (str): The new user message
+
+        Returns:
+            list: Chat messages ready for AriaTextGenerator.stream_chat
+        """
+        start = self._window_start(history, prompt)
+
+        if start > self.summarized_count:
+            # Fold a few extra turns so the next requests still have headroom
+            start = self._window_start(history, prompt, fill=self.refill_ratio)
+
+            # A longer summary can push more turns out of the window, so fold until it fits
+            while start > self.summarized_count:
+                if self.summarizer:
+                    self._fold_into_summary(history[self.summarized_count:start])
+                self.summarized_count = start
+                start = self._window_start(history, prompt, fill=self.refill_ratio)
+
+        messages = []
+        if self.system_prompt:
+            messages.append(AriaBase.text_message("system", self.system_prompt))
+        if self.summary:
+            messages.append(AriaBase.text_message("system", self._summary_text()))
+        for message in history[start:]:
+            messages.append(AriaBase.text_message(message["role"], message["content"]))
+        messages.append(AriaBase.text_message("user", prompt))
+        return messages
+
+    def estimate_tokens(self, messages):
+        """
+        Estimate the size of a list of chat messages
+
+        Args:
+            messages (list): Messages from build_messages
+
+        Returns:
+            int: Estimated token count
+        """
+        return sum(count_tokens(message["content"][0]["text"]) for message in messages)
@@ -0,0 +1,130 @@
+import re
+import shutil
+import subprocess
+import numpy as np
+
+
+def ffmpeg_binary():
+    """
+    Locate the ffmpeg executable
+
+    Prefers the binary bundled with imageio-ffmpeg (installed with moviepy)
+    and falls back to ffmpeg on PATH.
+
+    Returns:
+        str: Path to ffmpeg
+    """
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        path = shutil.which("ffmpeg")
+        if path is None:
+            raise Exception("ffmpeg executable not found")
+        return path
+
+
+def run_ffmpeg(args, input_bytes=None):
+    """
+    Run ffmpeg and wait for it to finish
+
+    Args:
+        args (list): Arguments after the executable, e.g. ['-i', 'in.mp4', 'out.mp4']
+        input_bytes (bytes, optional): Data written to ffmpeg's stdin
+
+    Returns:
+        subprocess.CompletedProcess: Finished process
+    """
+    command = [ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error", *[str(arg) for arg in args]]
+    result = subprocess.run(command, input=input_bytes, capture_output=True)
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg failed: {result.stderr.decode(errors='replace').strip()}")
+    return result
+
+
+def media_duration(path):
+    """
+    Read the duration of an audio or video file from ffmpeg's input summary
+
+    Args:
+        path (str): Media file
+
+    Returns:
+        float: Duration in seconds
+    """
+    result = subprocess.run([ffmpeg_binary(), "-hide_banner", "-i", str(path)], capture_output=True)
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr.decode(errors="replace"))
+    if match is None:
+        raise Exception(f"Could not read the duration of {path}")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+class FrameWriter:
+    def __init__(self, output_path, width, height, fps, output_args, extra_inputs=()):
+        """
+        Encode raw BGR frames by piping them into one ffmpeg process
+
+        Args:
+            output_path (str): File to write
+            width (int): Frame width in pixels
+            height (int): Frame height in pixels
+            fps (float): Frame rate of the piped frames
+            output_args (list): Encoder arguments, e.g. ['-c:v', 'libx264', '-pix_fmt', 'yuv420p']
+            extra_inputs (list, optional): Further input arguments after the frame pipe,
+                e.g. ['-i', 'narration.mp3']
+        """
+        command = [
+            ffmpeg_binary(), "-y", "-hide_banner", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+            *[str(arg) for arg in extra_inputs],
+            *[str(arg) for arg in output_args],
+            str(output_path)
+        ]
+        self.frames_written = 0
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def write(self, frames):
+        """
+        Send one frame (height, width, 3) or a block of frames (n, height, width, 3)
+
+        Args:
+            frames (np.ndarray): uint8 BGR pixels
+        """
+        frames = np.ascontiguousarray(frames)
+        try:
+            self.process.stdin.write(memoryview(frames).cast("B"))
+        except BrokenPipeError:
+            self.close()
+        self.frames_written += 1 if frames.ndim == 3 else len(frames)
+
+    def close(self):
+        """
+        Finish encoding
+
+        Returns:
+            int: Number of frames written
+        """
+        if not self.process.stdin.closed:
+            try:
+                self.process.stdin.close()
+            except BrokenPipeError:
+                pass
+        stderr = self.process.stderr.read()
+        if self.process.wait() != 0:
+            raise Exception(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+        return self.frames_written
+
+    def abort(self):
+        """Stop ffmpeg without finishing the file"""
+        self.process.kill()
+        self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
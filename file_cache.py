@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+
+
+def cache_key(*parts):
+    """
+    Build a content-addressed key from JSON-serializable parts
+
+    Args:
+        *parts: Values that identify the artifact, e.g. text, voice, model and format
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class FileCache:
+    def __init__(self, directory, max_bytes=500 * 1024 * 1024):
+        """
+        Directory of files stored under their cache key, with size-bounded LRU eviction
+
+        Reads refresh a file's modification time, and the least recently used
+        files are deleted once the directory grows past `max_bytes`.
+
+        Args:
+            directory (str or Path): Directory holding the cached files
+            max_bytes (int): Maximum total size of cached files (default: 500 MB)
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def path_for(self, key, suffix=""):
+        """Stable path of the artifact stored under `key`"""
+        return self.directory / f"{key}{suffix}"
+
+    def temp_path(self, key, suffix=""):
+        """Unique path in the cache directory for writing an artifact before put()"""
+        return self.directory / f".{key}.{uuid.uuid4().hex}.tmp{suffix}"
+
+    def get(self, key, suffix=""):
+        """
+        Look up a cached artifact
+
+        Args:
+            key (str): Key from cache_key
+            suffix (str): File extension, e.g. '.mp3'
+
+        Returns:
+            Path: Path to the artifact, or None on a miss
+        """
+        path = self.path_for(key, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, key, source_path, suffix=""):
+        """
+        Move a finished file into the cache
+
+        Args:
+            key (str): Key from cache_key
+            source_path (str or Path): File to move, ideally from temp_path()
+            suffix (str): File extension, e.g. '.mp3'
+
+        Returns:
+            Path: Stable path of the cached artifact
+        """
+        path = self.path_for(key, suffix)
+        os.replace(source_path, path)
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """
+        Delete least recently used artifacts until the cache fits in max_bytes
+
+        Args:
+            keep (Path, optional): Artifact that must not be evicted, e.g. the one just added
+        """
+        with self._lock:
+            entries = []
+            total = 0
+            for path in self.directory.iterdir():
+                if not path.is_file() or path.name.startswith("."):
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if keep is not None and path == Path(keep):
+                    continue
+                try:
+                    path.unlink()
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        """
+        Get cache counters
+
+        Returns:
+            dict: hits, misses, number of files and total bytes
+        """
+        files = [path for path in self.directory.iterdir() if path.is_file() and not path.name.startswith(".")]
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'files': len(files),
+            'bytes': sum(path.stat().st_size for path in files)
+        }
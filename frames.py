@@ -0,0 +1,367 @@
+import os
+import tempfile
+import cv2
+import numpy as np
+
+# Default ceiling for decoded frames held in memory at once
+DEFAULT_MEMORY_LIMIT = 256 * 1024 * 1024
+
+
+def ping_pong_indices(frame_count):
+    """
+    Source frame order for one forward-then-backward pass
+
+    The first and last frames are not repeated at the turnarounds, so the
+    sequence can be looped seamlessly.
+
+    Args:
+        frame_count (int): Frames in the source clip
+
+    Returns:
+        np.ndarray: Source frame index for each frame of the loop unit
+    """
+    forward = np.arange(frame_count)
+    return np.concatenate([forward, forward[-2:0:-1]])
+
+
+def timeline_indices(unit, total_frames):
+    """
+    Repeat a loop unit to cover `total_frames` output frames
+
+    Args:
+        unit (np.ndarray): Source frame indices of one loop, or blend rows (see seamless_loop_indices)
+        total_frames (int): Length of the output timeline in frames
+
+    Returns:
+        np.ndarray: Source frame index (or blend row) for each output frame
+    """
+    return np.take(unit, np.arange(total_frames) % len(unit), axis=0)
+
+
+# Mean squared thumbnail difference treated as no change at all (about 2 grey levels of noise)
+LOOP_NOISE_FLOOR = (2 / 255) ** 2
+
+
+def find_loop_point(spool, min_frames, min_start=0, max_seam=4.0, thumb_width=64, window=1, batch_rows=64):
+    """
+    Find a long loop whose seam is no harder than ordinary motion in the clip
+
+    Every frame is reduced to a small grayscale thumbnail, and the distance
+    between all pairs of thumbnails is computed with matrix products, a
+    batch of rows at a time. Distances are averaged along the diagonal over
+    `window` neighbouring frames, so motion has to line up as well as
+    content, and then divided by the median distance between adjacent
+    frames, so a seam scores 1 when the jump back looks like one normal
+    frame step.
+
+    Frames close together in time always look alike, so the lowest score
+    alone would simply pick the shortest loop allowed. Instead seams scoring
+    at most `max_seam` are ranked by loop length as a share of the clip
+    minus seam score over `max_seam`, so a cleaner seam beats a somewhat
+    longer loop and a longer loop beats a marginally cleaner seam.
+
+    Args:
+        spool (FrameSpool): Decoded source frames
+        min_frames (int): Shortest acceptable loop in frames
+        min_start (int): First frame a loop may start on (default: 0)
+        max_seam (float): Worst acceptable seam, in adjacent-frame steps (default: 4)
+        thumb_width (int): Thumbnail width in pixels (default: 64)
+        window (int): Neighbouring frames on each side compared along the diagonal (default: 1)
+        batch_rows (int): Rows of the distance matrix computed per batch (default: 64)
+
+    Returns:
+        tuple: (start, end, seam); playing frames start..end-1 and jumping back to start
+            loops cleanly. None if the clip is too short or has no acceptable seam.
+    """
+    count = spool.frame_count
+    min_start = max(min_start, window)
+    if count - window - min_start <= min_frames:
+        return None
+
+    thumb_height = max(1, round(spool.height * thumb_width / spool.width))
+    thumbs = np.empty((count, thumb_height * thumb_width), dtype=np.float32)
+    index = 0
+    for block in spool.iter_blocks():
+        for frame in block:
+            gray = cv2.cvtColor(cv2.resize(frame, (thumb_width, thumb_height), interpolation=cv2.INTER_AREA),
+                                cv2.COLOR_BGR2GRAY)
+            thumbs[index] = gray.reshape(-1)
+            index += 1
+    thumbs /= 255.0
+    norms = (thumbs ** 2).sum(axis=1)
+    step = max(float(np.median(((thumbs[1:] - thumbs[:-1]) ** 2).mean(axis=1))), LOOP_NOISE_FLOOR)
+
+    best = None
+    columns = np.arange(count)
+    # Rows/columns within `window` of either end have no full diagonal neighbourhood
+    for row_start in range(min_start, count - window, batch_rows):
+        row_stop = min(row_start + batch_rows, count - window)
+        rows = slice(row_start - window, row_stop + window)
+        # Mean squared difference between each thumbnail in the batch (plus neighbours) and all others
+        distances = (norms[rows, None] + norms[None, :] - 2 * thumbs[rows] @ thumbs.T) / thumbs.shape[1]
+
+        size = row_stop - row_start
+        seams = np.zeros((size, count - 2 * window), dtype=np.float32)
+        for offset in range(-window, window + 1):
+            seams += distances[window + offset:window + offset + size, window + offset:count - window + offset]
+        seams /= (2 * window + 1) * step
+
+        lengths = columns[None, window:count - window] - np.arange(row_start, row_stop)[:, None]
+        ranking = np.where((lengths >= min_frames) & (seams <= max_seam),
+                           lengths / count - seams / max_seam, -np.inf)
+        flat = int(np.argmax(ranking))
+        row, column = divmod(flat, ranking.shape[1])
+        if np.isfinite(ranking[row, column]) and (best is None or ranking[row, column] > best[3]):
+            best = (row_start + row, window + column, float(seams[row, column]), ranking[row, column])
+
+    if best is None:
+        return None
+    return best[:3]
+
+
+def seamless_loop_indices(spool, min_fraction=0.5, crossfade_frames=0):
+    """
+    One loop of the clip cut at its most seamless point, optionally crossfaded
+
+    Args:
+        spool (FrameSpool): Decoded source frames
+        min_fraction (float): Shortest acceptable loop as a fraction of the clip (default: 0.5)
+        crossfade_frames (int): Frames blended at the seam (default: 0)
+
+    Returns:
+        np.ndarray: Source frame indices of the loop, or, with a crossfade, rows of
+            (frame, blend frame, blend weight); None if the clip has no clean loop point
+    """
+    min_frames = max(2, int(spool.frame_count * min_fraction))
+    # The crossfade blends in the frames just before the loop start, so leave room for them
+    point = find_loop_point(spool, min_frames, min_start=min(crossfade_frames, min_frames // 2))
+    if point is None:
+        return None
+    start, end, _ = point
+    unit = np.arange(start, end)
+    crossfade_frames = min(crossfade_frames, start, len(unit) // 2)
+    if crossfade_frames <= 0:
+        return unit
+
+    # Fade the last frames of the loop into the frames that lead up to its start,
+    # so the jump back lands on exactly the content that follows
+    rows = np.zeros((len(unit), 3), dtype=np.float64)
+    rows[:, 0] = unit
+    rows[-crossfade_frames:, 1] = np.arange(start - crossfade_frames, start)
+    rows[-crossfade_frames:, 2] = np.arange(1, crossfade_frames + 1) / (crossfade_frames + 1)
+    return rows
+
+
+def resample_indices(indices, source_fps, fps):
+    """
+    Pick frames from a source-rate sequence for playback at another frame rate
+
+    Args:
+        indices (np.ndarray): Source frame indices at source_fps
+        source_fps (float): Frame rate of the source clip
+        fps (float): Output frame rate
+
+    Returns:
+        np.ndarray: Source frame indices at the output rate, covering the same duration
+    """
+    if not fps or fps >= source_fps:
+        return np.asarray(indices)
+    count = max(1, round(len(indices) * fps / source_fps))
+    positions = np.minimum((np.arange(count) * source_fps / fps).astype(int), len(indices) - 1)
+    return np.asarray(indices)[positions]
+
+
+class FrameSpool:
+    def __init__(self, video_path, memory_limit=DEFAULT_MEMORY_LIMIT, directory=None, max_height=None):
+        """
+        Decode a video once into a raw frame file that can be read in either direction
+
+        Frames are spilled to a temporary file as they are decoded and read
+        back in blocks that fit in `memory_limit`, so memory use does not
+        grow with the length of the clip.
+
+        Args:
+            video_path (str): Path to input video
+            memory_limit (int): Maximum bytes of frames held in memory at once (default: 256 MB)
+            directory (str, optional): Directory for the spill file (default: system temp dir)
+            max_height (int, optional): Downscale frames taller than this while decoding
+        """
+        cap = cv2.VideoCapture(str(video_path))
+        if not cap.isOpened():
+            raise Exception(f"Could not open video: {video_path}")
+
+        self.fps = cap.get(cv2.CAP_PROP_FPS)
+        self.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        resize = max_height is not None and self.height > max_height
+        if resize:
+            # Even dimensions, as yuv420p encoders require
+            self.width = max(2, round(self.width * max_height / self.height / 2) * 2)
+            self.height = max(2, max_height - max_height % 2)
+        self.shape = (self.height, self.width, 3)
+        self.frame_bytes = self.height * self.width * 3
+        self.block_frames = max(1, memory_limit // self.frame_bytes)
+
+        fd, self.path = tempfile.mkstemp(suffix=".raw", dir=directory)
+        self.owner = True
+        self.frame_count = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while True:
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    if resize:
+                        frame = cv2.resize(frame, (self.width, self.height), interpolation=cv2.INTER_AREA)
+                    f.write(frame.data)
+                    self.frame_count += 1
+        except Exception:
+            self.close()
+            raise
+        finally:
+            cap.release()
+
+    @classmethod
+    def attach(cls, path, shape, fps, frame_count, memory_limit=DEFAULT_MEMORY_LIMIT):
+        """
+        Open an existing spill file, e.g. in a worker process, without decoding again
+
+        The attached spool never deletes the file; the spool that decoded it does.
+
+        Args:
+            path (str): Spill file written by another FrameSpool
+            shape (tuple): (height, width, 3)
+            fps (float): Frame rate of the source clip
+            frame_count (int): Frames in the spill file
+            memory_limit (int): Maximum bytes of frames held in memory at once (default: 256 MB)
+
+        Returns:
+            FrameSpool: Read-only view of the spill file
+        """
+        spool = cls.__new__(cls)
+        spool.path = path
+        spool.owner = False
+        spool.fps = fps
+        spool.height, spool.width = shape[0], shape[1]
+        spool.shape = tuple(shape)
+        spool.frame_bytes = spool.height * spool.width * 3
+        spool.block_frames = max(1, memory_limit // spool.frame_bytes)
+        spool.frame_count = frame_count
+        return spool
+
+    def info(self):
+        """Arguments for FrameSpool.attach, picklable for worker processes"""
+        return {'path': self.path, 'shape': self.shape, 'fps': self.fps, 'frame_count': self.frame_count}
+
+    @property
+    def duration(self):
+        """Clip length in seconds"""
+        return self.frame_count / self.fps if self.fps else 0
+
+    def read(self, start, stop, out=None):
+        """
+        Read frames start..stop-1 in forward order
+
+        Args:
+            start (int): First frame index
+            stop (int): One past the last frame index
+            out (np.ndarray, optional): Buffer of at least stop - start frames to read into
+
+        Returns:
+            np.ndarray: Frames of shape (n, height, width, 3)
+        """
+        count = stop - start
+        if out is None:
+            out = np.empty((count, *self.shape), dtype=np.uint8)
+        block = out[:count]
+        with open(self.path, "rb") as f:
+            f.seek(start * self.frame_bytes)
+            f.readinto(memoryview(block).cast("B"))
+        return block
+
+    def iter_blocks(self, reverse=False):
+        """
+        Yield consecutive blocks of frames, reusing one buffer
+
+        Each block is only valid until the next one is requested.
+
+        Args:
+            reverse (bool): Start from the last frame and yield each block back to front
+
+        Yields:
+            np.ndarray: Frames of shape (n, height, width, 3)
+        """
+        buffer = np.empty((min(self.block_frames, max(1, self.frame_count)), *self.shape), dtype=np.uint8)
+        starts = range(0, self.frame_count, self.block_frames)
+        for start in (reversed(starts) if reverse else starts):
+            block = self.read(start, min(start + self.block_frames, self.frame_count), out=buffer)
+            yield block[::-1] if reverse else block
+
+    def iter_frames(self, reverse=False):
+        """
+        Yield single frames in forward or reverse order
+
+        Args:
+            reverse (bool): Yield from the last frame to the first
+
+        Yields:
+            np.ndarray: Frame of shape (height, width, 3), valid until the next block is read
+        """
+        for block in self.iter_blocks(reverse=reverse):
+            yield from block
+
+    def gather(self, indices):
+        """
+        Yield frames in an arbitrary source order, a memory-bounded block at a time
+
+        Args:
+            indices (sequence): Source frame index for each frame to produce, or rows of
+                (frame, blend frame, blend weight) as from seamless_loop_indices
+
+        Yields:
+            np.ndarray: Frames of shape (n, height, width, 3), reusing one buffer; each
+                block is only valid until the next one is requested
+        """
+        indices = np.asarray(indices)
+        blended = indices.ndim == 2
+        # Blending needs a second buffer, so blocks are half as long
+        block_frames = max(1, self.block_frames // 2) if blended else self.block_frames
+        buffer = np.empty((min(block_frames, max(1, len(indices))), *self.shape), dtype=np.uint8)
+        if blended:
+            others = np.empty_like(buffer)
+
+        with open(self.path, "rb") as f:
+            def read(index, out):
+                f.seek(int(index) * self.frame_bytes)
+                f.readinto(memoryview(out).cast("B"))
+
+            for start in range(0, len(indices), block_frames):
+                chunk = indices[start:start + block_frames]
+                if not blended:
+                    for row, index in enumerate(chunk):
+                        read(index, buffer[row])
+                    yield buffer[:len(chunk)]
+                    continue
+
+                for row, (index, _, weight) in enumerate(chunk):
+                    read(index, buffer[row])
+                    if weight > 0:
+                        read(chunk[row, 1], others[row])
+                rows = np.nonzero(chunk[:, 2] > 0)[0]
+                if len(rows):
+                    weights = chunk[rows, 2].astype(np.float32)[:, None, None, None]
+                    mixed = buffer[rows] * (1 - weights) + others[rows] * weights
+                    buffer[rows] = np.clip(mixed + 0.5, 0, 255).astype(np.uint8)
+                yield buffer[:len(chunk)]
+
+    def close(self):
+        """Delete the spill file"""
+        if self.owner and self.path and os.path.exists(self.path):
+            os.unlink(self.path)
+        self.path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
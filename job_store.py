@@ -0,0 +1,155 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+class JobStore:
+    def __init__(self, db_path=None):
+        """
+        Durable record of submitted Allegro jobs
+
+        Args:
+            db_path (str, optional): SQLite file path (default: output/allegro_jobs.sqlite3)
+        """
+        if db_path is None:
+            output_dir = Path(__file__).parent / "output"
+            output_dir.mkdir(exist_ok=True)
+            db_path = output_dir / "allegro_jobs.sqlite3"
+
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                request_id TEXT PRIMARY KEY,
+                prompt TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                video_url TEXT,
+                error TEXT,
+                checks INTEGER NOT NULL DEFAULT 0,
+                submitted_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                completed_at REAL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        self._conn.commit()
+
+    @staticmethod
+    def _to_dict(row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        return job
+
+    def add(self, request_id, prompt, params, submitted_at=None):
+        """
+        Record a newly submitted job as pending
+
+        Args:
+            request_id (str): Request ID returned by Allegro
+            prompt (str): Prompt the video was requested with
+            params (dict): Generation parameters such as num_steps, cfg_scale and seed
+            submitted_at (float, optional): time.time() of submission (default: now)
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO jobs (request_id, prompt, params, status, submitted_at, updated_at)
+                VALUES (?, ?, ?, 'pending', ?, ?)
+                """,
+                (request_id, prompt, json.dumps(params, sort_keys=True), submitted_at or now, now)
+            )
+            self._conn.commit()
+
+    def get(self, request_id):
+        """
+        Look up a job
+
+        Args:
+            request_id (str): Request ID returned by Allegro
+
+        Returns:
+            dict: Job fields, or None if the job is unknown
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE request_id = ?", (request_id,)).fetchone()
+        return self._to_dict(row)
+
+    def update(self, request_id, **fields):
+        """
+        Update fields of a job, e.g. status, video_url, error, checks or completed_at
+
+        Args:
+            request_id (str): Request ID returned by Allegro
+            **fields: Column values to set
+        """
+        if not fields:
+            return
+        fields['updated_at'] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE request_id = ?",
+                (*fields.values(), request_id)
+            )
+            self._conn.commit()
+
+    def by_status(self, *statuses, limit=100):
+        """
+        List jobs with any of the given statuses, newest first
+
+        Args:
+            *statuses (str): Statuses to include, e.g. 'pending'
+            limit (int): Maximum number of jobs returned (default: 100)
+
+        Returns:
+            list: Job dicts
+        """
+        placeholders = ", ".join("?" for _ in statuses)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs WHERE status IN ({placeholders}) ORDER BY submitted_at DESC LIMIT ?",
+                (*statuses, limit)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def find(self, prompt, params, statuses=('pending', 'completed')):
+        """
+        Find the newest job submitted with exactly this prompt and these parameters
+
+        Args:
+            prompt (str): Prompt the video was requested with
+            params (dict): Generation parameters such as num_steps, cfg_scale and seed
+            statuses (tuple): Statuses to consider (default: pending and completed)
+
+        Returns:
+            dict: Job fields, or None if there is no such job
+        """
+        placeholders = ", ".join("?" for _ in statuses)
+        with self._lock:
+            row = self._conn.execute(
+                f"""
+                SELECT * FROM jobs WHERE prompt = ? AND params = ? AND status IN ({placeholders})
+                ORDER BY submitted_at DESC LIMIT 1
+                """,
+                (prompt, json.dumps(params, sort_keys=True), *statuses)
+            ).fetchone()
+        return self._to_dict(row)
+
+    def pending(self):
+        """
+        List jobs that have not finished yet
+
+        Returns:
+            list: Job dicts
+        """
+        return self.by_status('pending', limit=-1)
@@ -1,18 +1,23 @@
+import argparse
 from aria import AriaTextGenerator
 from tts import TextToSpeech
 from allegro import VideoGenerator
 from video_downloader import VideoDownloader
 from video_editor import VideoEditor  # Import the video editor
-from tqdm import tqdm
+from video_cache import VideoCache
+from pipeline import build_poem_video_pipeline
+from batch import BatchRunner, DEFAULT_LIMITS, load_jobs
 
 def main():
     # Initialize all components
-    aria_generator = AriaTextGenerator()
-    tts_generator = TextToSpeech()
-    video_generator = VideoGenerator()
-    video_downloader = VideoDownloader()
-    video_editor = VideoEditor()  # Initialize video editor
-    
+    components = {
+        'aria': AriaTextGenerator(),
+        'tts': TextToSpeech(),
+        'video': VideoGenerator(),
+        'downloader': VideoDownloader(),
+        'editor': VideoEditor()  # Initialize video editor
+    }
+
     try:
         # Define the poem generation options
         options = {
@@ -22,64 +27,74 @@ def main():
             "keywords": ["trees", "rivers", "sky"]
         }
 
-        # Generate a poem
-        poem = aria_generator.generate_poem(
+        # Poem -> {speech, video -> download} -> edit, with speech and video running side by side
+        output_path = "final_poetry_video.mp4"
+        pipeline = build_poem_video_pipeline(
+            components,
             options=options,
-            language="english"
+            language="english",
+            voice="onyx",
+            video_filename="poetry_background.mp4",
+            output_path=output_path
         )
+        print("Running poem-to-video pipeline...")
+        result = pipeline.run()
+
         print("Generated Poem:")
-        print(poem)
-        
-        # Generate audio from the poem
-        print("\nGenerating audio...")
-        audio_path = tts_generator.generate_speech(
-            text=poem,
-            filename="generated_poem.mp3",
-            voice="onyx"
-        )
-        print(f"Audio generated successfully at: {audio_path}")
-        
-        # Generate video
-        print("\nGenerating video...")
-        prompt = "A serene natural scene with gentle movements, perfect for poetry background \n the poetry is "+ poem
-        request_id, video_url = video_generator.create_video(
-            prompt=prompt,
-            wait_for_completion=True
-        )
-        
-        if video_url:
-            print(f"Video generated successfully!")
-            print(f"Video URL: {video_url}")
-            
-            # Download the video
-            print("\nDownloading video...")
-            video_path = video_downloader.download_video(
-                url=video_url,
-                filename="poetry_background.mp4"
-            )
-            
-            # Get and display video info
-            video_info = video_downloader.get_video_info(video_path)
-            print("\nVideo Information:")
-            print(f"Location: {video_info['path']}")
-            print(f"Size: {video_info['size_mb']:.2f} MB")
-            
-            # Create final video with audio
-            print("\nCreating final video with audio...")
-            output_path = "final_poetry_video.mp4"
-            video_editor.create_video_with_audio(
-                video_path=str(video_path),
-                audio_path=str(audio_path),
-                output_path=output_path
-            )
-            print(f"Final video created successfully at: {output_path}")
-            
-        else:
-            print(f"Video generation started. Request ID: {request_id}")
-            print("Check status later using the request ID")
-        
+        print(result['poem'])
+        print(f"\nAudio generated successfully at: {result['speech']}")
+
+        # Get and display video info
+        video_info = components['downloader'].get_video_info(result['download'])
+        print("\nVideo Information:")
+        print(f"Location: {video_info['path']}")
+        print(f"Size: {video_info['size_mb']:.2f} MB")
+        print(f"SHA-256: {video_info['digest']}")
+
+        print(f"\nFinal video created successfully at: {result['edit']}")
+
+        print("\nStage timings:")
+        print(result.summary())
+
     except Exception as e:
         print(f"Error: {str(e)}")
 
+def run_batch(args):
+    """Run every job in a JSONL file, skipping jobs the manifest already lists as completed"""
+    video_generator = VideoGenerator()
+    video_downloader = VideoDownloader()
+    components = {
+        'aria': AriaTextGenerator(),
+        'tts': TextToSpeech(),
+        'video': video_generator,
+        'downloader': video_downloader,
+        # Identical video prompts within a batch are generated once
+        'videos': VideoCache(video_generator, video_downloader),
+        'editor': VideoEditor()
+    }
+
+    limits = {stage: getattr(args, f"{stage}_concurrency") for stage in DEFAULT_LIMITS}
+    runner = BatchRunner(components, args.manifest, limits=limits, workers=args.workers)
+    jobs = load_jobs(args.batch)
+    print(f"Running {len(jobs)} jobs from {args.batch}, manifest: {args.manifest}")
+    summary = runner.run(jobs)
+    print(f"Done: {summary['completed']} completed, {summary['failed']} failed, "
+          f"{summary['skipped']} skipped in {summary['wall_time']:.0f}s")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Generate poetry videos")
+    parser.add_argument("--batch", help="JSONL file of poem/voice/video job specs to run")
+    parser.add_argument("--manifest", default="output/batch_manifest.jsonl",
+                        help="JSONL manifest of artifacts and timings; completed jobs are skipped on rerun")
+    parser.add_argument("--workers", type=int, help="Jobs in progress at once (default: sum of stage limits)")
+    for stage, limit in DEFAULT_LIMITS.items():
+        parser.add_argument(f"--{stage}-concurrency", type=int, default=limit,
+                            help=f"Maximum concurrent {stage} calls (default: {limit})")
+    return parser.parse_args()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.batch:
+        run_batch(args)
+    else:
+        main()
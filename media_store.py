@@ -0,0 +1,330 @@
+import hashlib
+import os
+import shutil
+import stat
+import threading
+import time
+import uuid
+from pathlib import Path
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Blobs linked or added this recently are left alone by prune(), in case another
+# process is still linking them to a name
+PRUNE_GRACE_SECONDS = 60
+
+
+def new_hasher():
+    """Hash object used for media digests"""
+    return hashlib.sha256()
+
+
+def digest_file(path, hasher=None):
+    """
+    Hash a file's content
+
+    Args:
+        path (str or Path): File to hash
+        hasher (optional): Hash object to continue, e.g. from new_hasher()
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    hasher = hasher or new_hasher()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def link_or_copy(source_path, target_path):
+    """
+    Atomically make `target_path` a hard link to `source_path`
+
+    An existing target is replaced, never written through, so readers of
+    the old file are unaffected. File systems without hard links get a copy.
+
+    Args:
+        source_path (str or Path): Existing file
+        target_path (str or Path): Name to create or replace
+
+    Returns:
+        Path: target_path
+    """
+    target_path = Path(target_path)
+    if target_path.exists() and os.path.samefile(source_path, target_path):
+        return target_path
+
+    temp_path = target_path.with_name(f".{target_path.name}.{uuid.uuid4().hex}.link")
+    try:
+        os.link(source_path, temp_path)
+    except OSError:
+        shutil.copyfile(source_path, temp_path)
+    try:
+        os.replace(temp_path, target_path)
+    finally:
+        # rename() between two links to the same file succeeds without removing the source
+        if temp_path.exists():
+            temp_path.unlink()
+    return target_path
+
+
+class MediaStore:
+    def __init__(self, directory):
+        """
+        Content-addressed store of media files
+
+        Each distinct file is kept once as a read-only blob named by its
+        SHA-256 digest. Named files elsewhere are hard links to a blob, so
+        saving the same content under many names costs no extra disk, and
+        replacing a name never changes a file another reader has open.
+
+        Args:
+            directory (str or Path): Directory holding the blobs
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._verified = {}
+        self._inodes = {}
+
+    def blob_path(self, digest, suffix=".mp4"):
+        """Path of the blob for `digest`, sharded by its first two characters"""
+        return self.directory / digest[:2] / f"{digest}{suffix}"
+
+    def add(self, source_path, digest=None, suffix=".mp4", target_path=None):
+        """
+        Move a finished file into the store
+
+        If a blob with the same content already exists, the source is
+        deleted instead.
+
+        A new blob is hard-linked to the source before the source is renamed
+        to `target_path`, so it never has a single link that prune() in
+        another process could take for unused.
+
+        Args:
+            source_path (str or Path): File to store
+            digest (str, optional): Digest computed while writing the file (default: hash it now)
+            suffix (str): File extension of the blob (default: .mp4)
+            target_path (str or Path, optional): Name to link to the blob, see link(); doing
+                it here keeps prune() from removing the blob before it is linked
+
+        Returns:
+            str: Digest of the stored content
+        """
+        digest = digest or digest_file(source_path)
+        blob = self.blob_path(digest, suffix)
+        blob.parent.mkdir(exist_ok=True)
+        with self._lock:
+            while True:
+                try:
+                    os.link(source_path, blob)
+                except FileExistsError:
+                    try:
+                        if target_path is not None:
+                            self.link(digest, target_path, suffix)
+                    except FileNotFoundError:
+                        if blob.exists():
+                            raise
+                        # Pruned by another process in the meantime, so store this copy
+                        continue
+                    # The source may already have been replaced by the link when it is the target
+                    if os.path.exists(source_path) and not os.path.samefile(source_path, blob):
+                        os.unlink(source_path)
+                    break
+                except OSError:
+                    # No hard links on this file system
+                    os.replace(source_path, blob)
+                    if target_path is not None:
+                        self.link(digest, target_path, suffix)
+                    break
+
+                if os.name == "posix":
+                    # Blobs are shared by every link; nobody may write through one of them.
+                    # (Windows cannot replace read-only files, so they stay writable there.)
+                    os.chmod(blob, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+                if target_path is not None:
+                    os.replace(source_path, target_path)
+                else:
+                    os.unlink(source_path)
+                break
+            self._remember(blob, digest)
+        return digest
+
+    def link(self, digest, target_path, suffix=".mp4"):
+        """
+        Expose a blob under a name
+
+        The name is swapped in atomically. File systems without hard links
+        get a copy instead.
+
+        Args:
+            digest (str): Digest of a stored blob
+            target_path (str or Path): Name to create or replace
+            suffix (str): File extension of the blob (default: .mp4)
+
+        Returns:
+            Path: target_path
+        """
+        return link_or_copy(self.blob_path(digest, suffix), target_path)
+
+    def get(self, digest, suffix=".mp4", verify=True):
+        """
+        Look up a blob by digest
+
+        Args:
+            digest (str): Content digest
+            suffix (str): File extension of the blob (default: .mp4)
+            verify (bool): Re-hash the blob the first time it is read in this process (default: True)
+
+        Returns:
+            Path: Blob path, or None if the store has no such content
+        """
+        blob = self.blob_path(digest, suffix)
+        if not blob.exists():
+            return None
+        if verify:
+            self.verify(digest, suffix)
+        return blob
+
+    def verify(self, digest, suffix=".mp4"):
+        """
+        Check that a blob still hashes to its digest
+
+        Results are remembered until the file's size or modification time
+        changes. A corrupt blob is deleted.
+
+        Args:
+            digest (str): Content digest
+            suffix (str): File extension of the blob (default: .mp4)
+
+        Returns:
+            bool: True when the content matches
+        """
+        blob = self.blob_path(digest, suffix)
+        info = blob.stat()
+        signature = (info.st_ino, info.st_size, info.st_mtime_ns)
+        if self._verified.get(digest) == signature:
+            return True
+        if digest_file(blob) != digest:
+            os.chmod(blob, stat.S_IWUSR | stat.S_IRUSR)
+            blob.unlink()
+            raise Exception(f"Stored media {digest} is corrupt and was removed")
+        self._verified[digest] = signature
+        self._remember(blob, digest)
+        return True
+
+    def verify_path(self, path):
+        """
+        Check a named file against the blob it links to, see get()
+
+        Args:
+            path (str or Path): Named file
+
+        Returns:
+            bool: True if the file links to a stored blob with intact content, False if it
+                links to no blob; a corrupt blob is removed and raises, as in verify()
+        """
+        info = os.stat(path)
+        key = (info.st_dev, info.st_ino)
+        if key not in self._inodes:
+            self._scan()
+        digest = self._inodes.get(key)
+        if digest is None:
+            return False
+        return self.get(digest, suffix=Path(path).suffix) is not None
+
+    def digest_for(self, path):
+        """
+        Find the digest of a named file
+
+        Hard links share the blob's inode, so stored files are identified
+        without re-reading them; other files are hashed.
+
+        Args:
+            path (str or Path): Named file
+
+        Returns:
+            str: Hex SHA-256 digest
+        """
+        info = os.stat(path)
+        key = (info.st_dev, info.st_ino)
+        if key not in self._inodes:
+            self._scan()
+        return self._inodes.get(key) or digest_file(path)
+
+    def prune(self):
+        """
+        Delete blobs no named file links to any more
+
+        Blobs whose links changed in the last PRUNE_GRACE_SECONDS are kept.
+
+        Returns:
+            int: Bytes freed
+        """
+        freed = 0
+        cutoff = time.time() - PRUNE_GRACE_SECONDS
+        with self._lock:
+            for blob in self.directory.glob("*/*"):
+                try:
+                    info = blob.stat()
+                except FileNotFoundError:
+                    continue
+                # Linking a file updates its ctime
+                if info.st_nlink == 1 and info.st_ctime < cutoff:
+                    os.chmod(blob, stat.S_IWUSR | stat.S_IRUSR)
+                    blob.unlink()
+                    freed += info.st_size
+                    self._inodes.pop((info.st_dev, info.st_ino), None)
+        return freed
+
+    def stats(self):
+        """
+        Get store size
+
+        Returns:
+            dict: Number of blobs, their total bytes and the bytes all their links would take as copies
+        """
+        blobs = [blob.stat() for blob in self.directory.glob("*/*")]
+        return {
+            'blobs': len(blobs),
+            'bytes': sum(info.st_size for info in blobs),
+            'linked_bytes': sum(info.st_size * max(1, info.st_nlink - 1) for info in blobs)
+        }
+
+    def _remember(self, blob, digest):
+        info = blob.stat()
+        self._inodes[(info.st_dev, info.st_ino)] = digest
+
+    def _scan(self):
+        for blob in self.directory.glob("*/*"):
+            try:
+                info = blob.stat()
+            except FileNotFoundError:
+                continue
+            self._inodes[(info.st_dev, info.st_ino)] = blob.stem
+
+
+_default_stores = {}
+_default_stores_lock = threading.Lock()
+
+
+def get_media_store(directory):
+    """
+    Get the process-wide MediaStore for a directory, creating it on first use
+
+    Args:
+        directory (str or Path): Directory holding the blobs
+
+    Returns:
+        MediaStore: Shared store
+    """
+    key = os.path.abspath(directory)
+    with _default_stores_lock:
+        if key not in _default_stores:
+            _default_stores[key] = MediaStore(directory)
+        return _default_stores[key]
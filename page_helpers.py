@@ -0,0 +1,64 @@
+import streamlit as st
+
+# MP3 bytes (a few seconds of speech) to receive before the preview player appears
+PREVIEW_BYTES = 128 * 1024
+
+
+def stream_audio_with_preview(tts, text, filename, voice):
+    """Stream speech to disk and start playing the opening seconds before synthesis finishes"""
+    preview = st.empty()
+    stream = tts.stream_speech(text=text, filename=filename, voice=voice)
+    preview_shown = False
+    for bytes_written in stream:
+        if not preview_shown and bytes_written >= PREVIEW_BYTES:
+            with preview.container():
+                st.caption("Preview while the rest is being generated")
+                st.audio(stream.part_path.read_bytes(), format="audio/mp3", autoplay=True)
+            preview_shown = True
+    return stream.path
+
+
+def video_progress_reporter():
+    """Progress bar callback for VideoGenerator polling that shows an ETA"""
+    progress_bar = st.progress(0.0, text="Submitting video generation...")
+
+    def report(progress):
+        elapsed = progress['elapsed']
+        eta = progress['eta']
+        if eta is None:
+            fraction = 0.0
+            text = f"Generating video... {elapsed:.0f}s elapsed, next check in {progress['next_check_in']:.0f}s"
+        else:
+            fraction = min(elapsed / (elapsed + eta), 0.99)
+            text = f"Generating video... {elapsed:.0f}s elapsed, about {eta:.0f}s remaining"
+        progress_bar.progress(fraction, text=text)
+
+    return report
+
+
+def resume_video_job(components, show_video):
+    """
+    Expander for picking up a video job started earlier, e.g. before a page reload
+
+    Args:
+        components (dict): Page components with 'video' and 'videos'
+        show_video (callable): Called with the path of the finished video
+    """
+    with st.expander("Resume a video job"):
+        unfinished = [job['request_id'] for job in components['video'].store.by_status('pending', 'expired', limit=20)]
+        if unfinished:
+            st.caption("Unfinished jobs: " + ", ".join(unfinished))
+        resume_id = st.text_input(
+            "Request ID",
+            value=st.session_state.video_request_id or (unfinished[0] if unfinished else "")
+        )
+        if st.button("Resume Video Job") and resume_id.strip():
+            with st.spinner("Waiting for the video job..."):
+                try:
+                    st.session_state.video_request_id = resume_id.strip()
+                    show_video(components['videos'].resume(
+                        resume_id.strip(),
+                        progress_callback=video_progress_reporter()
+                    ))
+                except Exception as e:
+                    st.error(f"Error with video: {str(e)}")
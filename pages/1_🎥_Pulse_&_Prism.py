@@ -4,10 +4,12 @@ import time
 import os
 import base64
 from aria import AriaTextGenerator
-from tts import TextToSpeech
-from allegro import VideoGenerator
-from video_downloader import VideoDownloader
+from tts import TextToSpeech, MAX_INPUT_CHARS, speech_timings
+from video_cache import get_video_cache
+from captions import can_render
 from video_editor import VideoEditor
+from pipeline import build_poem_video_pipeline
+from page_helpers import resume_video_job, stream_audio_with_preview, video_progress_reporter
 
 def load_css():
     st.markdown("""
@@ -83,6 +85,8 @@ def get_download_link(file_path, link_text):
     b64 = base64.b64encode(data).decode()
     return f'<a href="data:application/octet-stream;base64,{b64}" download="{os.path.basename(file_path)}">{link_text}</a>'
 
+VOICE_PREVIEW_TEXT = "Words take flight, and every line becomes a scene."
+
 def cleanup_files():
     if st.session_state.audio_path and os.path.exists(st.session_state.audio_path):
         os.remove(st.session_state.audio_path)
@@ -103,15 +107,27 @@ def main():
         st.session_state.video_path = None
     if 'final_video_path' not in st.session_state:
         st.session_state.final_video_path = None
+    if 'video_request_id' not in st.session_state:
+        st.session_state.video_request_id = None
+    if 'render_plan' not in st.session_state:
+        st.session_state.render_plan = None
+    if 'render_plan_key' not in st.session_state:
+        st.session_state.render_plan_key = None
+    if 'preview_video_path' not in st.session_state:
+        st.session_state.preview_video_path = None
 
     # Initialize components
     @st.cache_resource
     def initialize_components():
+        # One video cache and generator per process, shared with the other pages, so each
+        # job has one poller and each video one download
+        videos = get_video_cache()
         return {
             'aria': AriaTextGenerator(),
             'tts': TextToSpeech(),
-            'video': VideoGenerator(),
-            'downloader': VideoDownloader(),
+            'video': videos.generator,
+            'downloader': videos.downloader,
+            'videos': videos,
             'editor': VideoEditor()
         }
 
@@ -136,6 +152,17 @@ def main():
         keywords = st.text_input("Keywords (Optional)", placeholder="Enter keywords for your poem")
         language = st.selectbox("Language", list(languages.keys()))
         voice = st.selectbox("Voice", list(voices.keys()))
+        if st.button("Preview Voice"):
+            try:
+                # Previews are served from the TTS audio cache after the first request
+                preview_path = components['tts'].generate_speech(
+                    text=VOICE_PREVIEW_TEXT,
+                    filename="voice_preview.mp3",
+                    voice=voices[voice]
+                )
+                st.audio(str(preview_path), autoplay=True)
+            except Exception as e:
+                st.error(f"Error previewing voice: {str(e)}")
 
     # Main content tabs
     tabs = st.tabs(["Generate Poetry", "Create Audio", "Generate Video", "Final Result"])
@@ -143,15 +170,20 @@ def main():
     # Poetry Generation Tab
     with tabs[0]:
         st.header("1. Generate Poetry")
-        generate_button = st.button("Generate Poetry")
+        col_generate, col_regenerate = st.columns([1, 1])
+        with col_generate:
+            generate_button = st.button("Generate Poetry")
+        with col_regenerate:
+            regenerate_button = st.button("Regenerate", help="Ignore the cached poem and ask ARIA for a new one")
+        poem_streamed = False
         
-        if generate_button:
+        if generate_button or regenerate_button:
             if not poetry_style.strip():
                 st.error("Please enter a poetry style")
             else:
-                with st.spinner("Generating Using Aria..."):
-                    try:
-                        st.session_state.generated_poem = components['aria'].generate_poem(
+                try:
+                    with st.spinner("Generating Using Aria..."):
+                        stream = components['aria'].stream_poem(
                             options={
                                 "title": title,
                                 "tone": tone,
@@ -159,13 +191,22 @@ def main():
                                 "keywords": keywords
                             },
                             language=languages[language],
-                            verses=verses
+                            verses=verses,
+                            regenerate=regenerate_button
                         )
+                    # Show the poem verse by verse while ARIA is still writing it
+                    st.markdown("### Generated Poetry")
+                    st.write_stream(stream)
+                    st.session_state.generated_poem = stream.text
+                    poem_streamed = True
+                    if stream.result.cached:
+                        st.success("Poetry loaded from cache!")
+                    else:
                         st.success("Poetry generated successfully!")
-                    except Exception as e:
-                        st.error(f"Error generating poem: {str(e)}")
+                except Exception as e:
+                    st.error(f"Error generating poem: {str(e)}")
         
-        if st.session_state.generated_poem:
+        if st.session_state.generated_poem and not poem_streamed:
             st.markdown("### Generated Poetry")
             st.code(st.session_state.generated_poem)
 
@@ -173,14 +214,27 @@ def main():
     with tabs[1]:
         st.header("2. Create Audio")
         if st.session_state.generated_poem:
+            progressive = st.checkbox(
+                "Play while generating", value=True,
+                help="Stream the audio to disk and start playback before synthesis finishes"
+            )
             if st.button("Generate Audio"):
                 with st.spinner("Generating audio..."):
                     try:
-                        st.session_state.audio_path = components['tts'].generate_speech(
-                            text=st.session_state.generated_poem,
-                            filename="generated_poem.mp3",
-                            voice=voices[voice]
-                        )
+                        if progressive and len(st.session_state.generated_poem) <= MAX_INPUT_CHARS:
+                            st.session_state.audio_path = stream_audio_with_preview(
+                                components['tts'],
+                                text=st.session_state.generated_poem,
+                                filename="generated_poem.mp3",
+                                voice=voices[voice]
+                            )
+                        else:
+                            st.session_state.audio_path = components['tts'].generate_speech(
+                                text=st.session_state.generated_poem,
+                                filename="generated_poem.mp3",
+                                voice=voices[voice],
+                                parallel=True
+                            )
                         st.success("Audio generated successfully!")
                     except Exception as e:
                         st.error(f"Error generating audio: {str(e)}")
@@ -191,6 +245,15 @@ def main():
         else:
             st.warning("Please generate a poem first.")
 
+    def on_video_submit(request_id):
+        st.session_state.video_request_id = request_id
+        st.info(f"Video job {request_id} is running. If you leave this page, resume it below.")
+
+    def show_video(video_path):
+        st.session_state.video_path = video_path
+        st.success("Video generated successfully!")
+        st.markdown(get_download_link(video_path, "Download Raw Video"), unsafe_allow_html=True)
+
     # Video Generation Tab
     with tabs[2]:
         st.header("3. Generate Video")
@@ -204,55 +267,118 @@ def main():
                 if not video_prompt.strip():
                     st.error("Please enter a video prompt")
                 else:
-                    with st.spinner("Initializing video generation. This will take at least 3 minutes, so go grab a cup of coffee ☕ and come back to see the magic"):
+                    with st.spinner("Generating video. This usually takes a few minutes, so go grab a cup of coffee ☕ and come back to see the magic"):
                         try:
-                            request_id, video_url = components['video'].create_video(
-                                prompt=video_prompt,
-                                wait_for_completion=True
-                            )
-                            
-                            if video_url:
-                                video_path = components['downloader'].download_video(
-                                    url=video_url,
-                                    filename="poetry_background.mp4"
-                                )
-                                st.session_state.video_path = video_path
-                                st.success("Video generated successfully!")
-                                st.markdown(get_download_link(video_path, "Download Raw Video"), unsafe_allow_html=True)
+                            # Identical prompts reuse the cached video or join the running job
+                            show_video(components['videos'].get_or_create(
+                                video_prompt,
+                                progress_callback=video_progress_reporter(),
+                                on_submit=on_video_submit
+                            ))
                             
                         except Exception as e:
                             st.error(f"Error with video: {str(e)}")
         else:
             st.warning("Please generate audio first.")
 
+        resume_video_job(components, show_video)
+
     # Final Result Tab
     with tabs[3]:
         st.header("4. Final Result")
         if st.session_state.video_path and st.session_state.audio_path:
-            if st.button("Create Final Video"):
-                with st.spinner("Creating final video with effects..."):
+            loop_style = st.radio(
+                "Loop style",
+                ["Forward and reverse", "Seamless loop"],
+                horizontal=True,
+                help="A seamless loop cuts the clip where it best matches its start, which renders about twice as fast. "
+                     "Clips without a clean match are played forward and reverse instead."
+            )
+            loop = "seamless" if loop_style == "Seamless loop" else "ping_pong"
+            crossfade = 0.25 if loop == "seamless" else 0.0
+            captions_supported = bool(st.session_state.generated_poem) and can_render(st.session_state.generated_poem)
+            burn_captions = st.checkbox(
+                "Show the poem as captions",
+                value=False,
+                disabled=not captions_supported,
+                help="Each line appears while it is read aloud" if captions_supported else
+                     "Captions are only available for English poems: the caption font has no Urdu letters "
+                     "and can't join them or write right to left"
+            ) and captions_supported
+            captions = st.session_state.generated_poem if burn_captions else None
+
+            def render_plan():
+                # One plan per video/audio pair and settings, so finalizing reuses what the
+                # preview worked out
+                key = (str(st.session_state.video_path), str(st.session_state.audio_path), loop, burn_captions,
+                       st.session_state.generated_poem)
+                if st.session_state.render_plan is None or st.session_state.render_plan_key != key:
+                    st.session_state.render_plan = components['editor'].plan(
+                        str(st.session_state.video_path), str(st.session_state.audio_path),
+                        loop=loop, crossfade=crossfade, captions=captions,
+                        caption_timings=speech_timings(st.session_state.audio_path) if captions else None
+                    )
+                    st.session_state.render_plan_key = key
+                return st.session_state.render_plan
+
+            preview_col, final_col = st.columns(2)
+            with preview_col:
+                limit_preview = st.checkbox("Only preview the first 15 seconds", value=True)
+                if st.button("Preview"):
+                    with st.spinner("Rendering a quick draft..."):
+                        try:
+                            plan = render_plan()
+                            st.session_state.preview_video_path = components['editor'].preview(
+                                plan, max_duration=15 if limit_preview else None
+                            )
+                        except Exception as e:
+                            st.error(f"Error creating preview: {str(e)}")
+            with final_col:
+                if st.button("Create Final Video"):
+                    with st.spinner("Creating final video with effects..."):
+                        try:
+                            plan = render_plan()
+                            output_path = "final_poetry_video.mp4"
+                            final_path = components['editor'].finalize(plan, output_path=output_path)
+                            st.session_state.final_video_path = final_path
+                            st.success("Final video created successfully!")
+                        except Exception as e:
+                            st.error(f"Error creating final video: {str(e)}")
+
+            if st.session_state.preview_video_path:
+                st.caption("Draft preview (low resolution)")
+                st.video(str(st.session_state.preview_video_path))
+
+            if st.session_state.final_video_path:
+                st.video(str(st.session_state.final_video_path))
+                st.markdown(get_download_link(st.session_state.final_video_path, "Download Final Video"), unsafe_allow_html=True)
+        elif st.session_state.generated_poem:
+            st.info("Audio and video can be created together: narration and video generation run side by side.")
+            if st.button("Create Audio, Video and Final Video"):
+                with st.spinner("Running narration, video generation and editing..."):
                     try:
-                        output_path = "final_poetry_video.mp4"
-                        final_path = components['editor'].create_video_with_audio(
-                            video_path=str(st.session_state.video_path),
-                            audio_path=str(st.session_state.audio_path),
-                            output_path=output_path
-                        )
-                        st.session_state.final_video_path = final_path
+                        result = build_poem_video_pipeline(
+                            components,
+                            poem=st.session_state.generated_poem,
+                            voice=voices[voice],
+                            output_path="final_poetry_video.mp4"
+                        ).run()
+                        st.session_state.audio_path = result['speech']
+                        st.session_state.video_path = result['video']
+                        st.session_state.final_video_path = result['edit']
                         st.success("Final video created successfully!")
+                        st.code(result.summary())
+                        st.video(str(result['edit']))
                     except Exception as e:
                         st.error(f"Error creating final video: {str(e)}")
-            
-            if st.session_state.final_video_path:
-                st.video(str(st.session_state.final_video_path))
-                st.markdown(get_download_link(st.session_state.final_video_path, "Download Final Video"), unsafe_allow_html=True)
         else:
             st.warning("Please generate video and audio first.")
 
     # Cleanup button
     if st.sidebar.button("Clear All Files"):
         cleanup_files()
-        for key in ['generated_poem', 'audio_path', 'video_path', 'final_video_path']:
+        for key in ['generated_poem', 'audio_path', 'video_path', 'final_video_path', 'video_request_id',
+                    'render_plan', 'render_plan_key', 'preview_video_path']:
             if key in st.session_state:
                 st.session_state[key] = None
         st.rerun()
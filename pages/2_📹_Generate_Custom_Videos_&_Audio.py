@@ -1,7 +1,7 @@
 import streamlit as st
-from tts import TextToSpeech
-from allegro import VideoGenerator
-from video_downloader import VideoDownloader
+from tts import TextToSpeech, MAX_INPUT_CHARS
+from video_cache import get_video_cache
+from page_helpers import resume_video_job, stream_audio_with_preview, video_progress_reporter
 import os
 import base64
 
@@ -60,6 +60,8 @@ def main():
         st.session_state.audio_path = None
     if 'video_path' not in st.session_state:
         st.session_state.video_path = None
+    if 'video_request_id' not in st.session_state:
+        st.session_state.video_request_id = None
     
     # Add cleanup function
     def cleanup_files():
@@ -71,10 +73,14 @@ def main():
     # Initialize components
     @st.cache_resource
     def initialize_components():
+        # One video cache and generator per process, shared with the other pages, so each
+        # job has one poller and each video one download
+        videos = get_video_cache()
         return {
             'tts': TextToSpeech(),
-            'video': VideoGenerator(),
-            'downloader': VideoDownloader()
+            'video': videos.generator,
+            'downloader': videos.downloader,
+            'videos': videos
         }
     
     components = initialize_components()
@@ -87,17 +93,30 @@ def main():
     user_text = st.text_area("Your Text", height=150, 
                             placeholder="Enter the text you want to convert to speech...")
     voice = st.selectbox("Select Voice", list(voices.keys()))
+    progressive = st.checkbox(
+        "Play while generating", value=True,
+        help="Stream the audio to disk and start playback before synthesis finishes"
+    )
     
     # Audio generation section
     st.header("Generate Audio")
     if st.button("Create Audio") and user_text:
         with st.spinner("Generating audio..."):
             try:
-                audio_path = components['tts'].generate_speech(
-                    text=user_text,
-                    filename="custom_audio.mp3",
-                    voice=voices[voice]
-                )
+                if progressive and len(user_text) <= MAX_INPUT_CHARS:
+                    audio_path = stream_audio_with_preview(
+                        components['tts'],
+                        text=user_text,
+                        filename="custom_audio.mp3",
+                        voice=voices[voice]
+                    )
+                else:
+                    audio_path = components['tts'].generate_speech(
+                        text=user_text,
+                        filename="custom_audio.mp3",
+                        voice=voices[voice],
+                        parallel=True
+                    )
                 st.session_state.audio_path = str(audio_path)
                 st.success("Audio generated successfully!")
             except Exception as e:
@@ -114,23 +133,27 @@ def main():
         placeholder="Describe the video scene you want to generate...",
         help="Describe the visual scene you want for your video background")
     
+    def on_video_submit(request_id):
+        st.session_state.video_request_id = request_id
+        st.info(f"Video job {request_id} is running. If you leave this page, resume it below.")
+
+    def show_video(video_path):
+        st.session_state.video_path = str(video_path)
+        st.success("Video generated successfully!")
+
     if st.button("Create Video") and video_prompt:
         with st.spinner("Generating video (this may take a few minutes)..."):
             try:
-                request_id, video_url = components['video'].create_video(
-                    prompt=video_prompt,
-                    wait_for_completion=True
-                )
-                
-                if video_url:
-                    video_path = components['downloader'].download_video(
-                        url=video_url,
-                        filename="custom_video.mp4"
-                    )
-                    st.session_state.video_path = str(video_path)
-                    st.success("Video generated successfully!")
+                # Identical prompts reuse the cached video or join the running job
+                show_video(components['videos'].get_or_create(
+                    video_prompt,
+                    progress_callback=video_progress_reporter(),
+                    on_submit=on_video_submit
+                ))
             except Exception as e:
                 st.error(f"Error generating video: {str(e)}")
+
+    resume_video_job(components, show_video)
     
     # Display video if available
     if st.session_state.video_path and os.path.exists(st.session_state.video_path):
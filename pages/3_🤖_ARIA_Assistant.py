@@ -1,5 +1,6 @@
 import streamlit as st
 from aria import AriaTextGenerator
+from conversation import ConversationContext
 
 def load_css():
     st.markdown("""
@@ -51,6 +52,20 @@ def main():
     if 'messages' not in st.session_state:
         st.session_state.messages = []
 
+    # Initialize the conversation context that keeps requests within a token budget
+    if 'context' not in st.session_state:
+        st.session_state.context = ConversationContext(summarizer=st.session_state.aria.generate_text)
+
+    with st.sidebar:
+        st.session_state.context.token_budget = st.slider(
+            "Context budget (tokens)", 500, 8000, st.session_state.context.token_budget, step=250,
+            help="Older messages beyond this budget are summarized instead of being sent verbatim"
+        )
+        if st.button("Clear Conversation"):
+            st.session_state.messages = []
+            st.session_state.context.reset()
+            st.rerun()
+
     # Display chat history
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
@@ -58,18 +73,21 @@ def main():
 
     # Chat input
     if prompt := st.chat_input("Ask ARIA anything about poetry or writing..."):
+        history = list(st.session_state.messages)
         st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.markdown(prompt)
 
         with st.chat_message("assistant"):
-            with st.spinner("ARIA is thinking..."):
-                try:
-                    response = st.session_state.aria.generate_text(prompt)
-                    st.markdown(response)
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
+            try:
+                with st.spinner("ARIA is thinking..."):
+                    messages = st.session_state.context.build_messages(history, prompt)
+                    stream = st.session_state.aria.stream_chat(messages)
+                # Render tokens as they arrive instead of waiting for the full reply
+                st.write_stream(stream)
+                st.session_state.messages.append({"role": "assistant", "content": stream.text})
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,223 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from tts import speech_timings
+from captions import can_render
+
+
+class Stage:
+    def __init__(self, name, func, deps=()):
+        """
+        One step of a pipeline
+
+        Args:
+            name (str): Unique stage name; its result is passed to dependents under this name
+            func (callable): Called with one keyword argument per dependency, returns the stage result
+            deps (tuple): Names of the stages this one needs
+        """
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+
+class PipelineResult:
+    def __init__(self, results, timings, wall_time):
+        """
+        Outcome of a pipeline run
+
+        Args:
+            results (dict): Stage name -> stage result
+            timings (dict): Stage name -> {'start', 'end', 'duration', 'waited'} in seconds from
+                the run start; 'waited' is time spent waiting for a concurrency slot
+            wall_time (float): Seconds the whole run took
+        """
+        self.results = results
+        self.timings = timings
+        self.wall_time = wall_time
+
+    def __getitem__(self, name):
+        return self.results[name]
+
+    def summary(self):
+        """
+        Human readable per-stage timings
+
+        Returns:
+            str: One line per stage in start order, plus the total
+        """
+        lines = [
+            f"{name:<10} {timing['start']:7.1f}s -> {timing['end']:7.1f}s  ({timing['duration']:.1f}s)"
+            for name, timing in sorted(self.timings.items(), key=lambda item: item[1]['start'])
+        ]
+        serial = sum(timing['duration'] for timing in self.timings.values())
+        lines.append(f"total {self.wall_time:.1f}s (stages sum to {serial:.1f}s)")
+        return "\n".join(lines)
+
+
+class Pipeline:
+    def __init__(self, stages, max_workers=None, limits=None):
+        """
+        Run stages as a dependency graph, starting each as soon as its dependencies finish
+
+        Independent stages run concurrently on a thread pool.
+
+        Args:
+            stages (list): Stage objects; dependencies must refer to stages in the list
+            max_workers (int, optional): Maximum concurrent stages (default: number of stages)
+            limits (dict, optional): Stage name -> threading.Semaphore; sharing the same
+                semaphores between pipelines caps how many of that stage run at once overall
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers or max(1, len(stages))
+        self.limits = limits or {}
+
+        for stage in stages:
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise Exception(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise Exception(f"Pipeline has a dependency cycle through '{name}'")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def run(self):
+        """
+        Execute every stage
+
+        If a stage fails, no new stages are started, running ones are allowed
+        to finish, and the first error is raised.
+
+        Returns:
+            PipelineResult: Stage results and per-stage timings
+        """
+        results = {}
+        timings = {}
+        started_at = time.perf_counter()
+        remaining = dict(self.stages)
+        running = {}
+        error = None
+
+        def execute(stage):
+            limit = self.limits.get(stage.name)
+            queued = time.perf_counter() - started_at
+            if limit is not None:
+                limit.acquire()
+            start = time.perf_counter() - started_at
+            try:
+                return stage.func(**{dep: results[dep] for dep in stage.deps})
+            finally:
+                if limit is not None:
+                    limit.release()
+                end = time.perf_counter() - started_at
+                timings[stage.name] = {'start': start, 'end': end, 'duration': end - start, 'waited': start - queued}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while remaining or running:
+                if error is None:
+                    ready = [stage for stage in remaining.values() if all(dep in results for dep in stage.deps)]
+                    for stage in ready:
+                        del remaining[stage.name]
+                        running[executor.submit(execute, stage)] = stage.name
+
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        if error is None:
+                            error = Exception(f"Stage '{name}' failed: {str(e)}")
+
+        if error is not None:
+            raise error
+        return PipelineResult(results, timings, time.perf_counter() - started_at)
+
+
+VIDEO_PROMPT_TEMPLATE = "A serene natural scene with gentle movements, perfect for poetry background \n the poetry is {poem}"
+
+
+def build_poem_video_pipeline(components, options=None, poem=None, verses=1, language="english", voice="onyx",
+                              video_prompt=None, video_filename="poetry_background.mp4", output_path=None,
+                              limits=None, captions=False):
+    """
+    Build the poem -> {speech, video -> download} -> edit pipeline
+
+    Speech synthesis and video generation only need the poem, so they run
+    side by side and TTS drops off the critical path.
+
+    Args:
+        components (dict): 'aria', 'tts', 'video', 'downloader' and 'editor' instances;
+            with a 'videos' VideoCache, generation and download become one cached 'video' stage
+        options (dict, optional): Poem options for AriaTextGenerator.generate_poem
+        poem (str, optional): Existing poem; skips generation when given
+        verses (int): Number of verses to generate (default: 1)
+        language (str): Language for the poem (default: "english")
+        voice (str): TTS voice (default: onyx)
+        video_prompt (str, optional): Allegro prompt (default: VIDEO_PROMPT_TEMPLATE filled with the poem)
+        video_filename (str): Filename for the downloaded video (default: poetry_background.mp4)
+        output_path (str, optional): Path for the final video (default: editor default)
+        limits (dict, optional): Per-stage semaphores, see Pipeline
+        captions (bool): Burn the poem into the video, timed to the narration; skipped for text
+            captions.can_render() rejects, such as Urdu (default: False)
+
+    Returns:
+        Pipeline: Ready to run; results are named poem, speech, video, download and edit
+    """
+    def make_poem():
+        if poem:
+            return poem
+        return components['aria'].generate_poem(options=options or {}, verses=verses, language=language)
+
+    def make_speech(poem):
+        return components['tts'].generate_speech(text=poem, voice=voice, parallel=True)
+
+    def prompt_for(poem):
+        return video_prompt or VIDEO_PROMPT_TEMPLATE.format(poem=poem)
+
+    def make_video(poem):
+        if 'videos' in components:
+            return components['videos'].get_or_create(prompt_for(poem))
+        return components['video'].await_video(components['video'].submit(prompt_for(poem)))
+
+    def download(video):
+        return components['downloader'].download_video(url=video, filename=video_filename)
+
+    stages = [
+        Stage("poem", make_poem),
+        Stage("speech", make_speech, deps=("poem",)),
+        Stage("video", make_video, deps=("poem",)),
+    ]
+    if 'videos' in components:
+        video_stage = "video"
+    else:
+        stages.append(Stage("download", download, deps=("video",)))
+        video_stage = "download"
+
+    def edit(speech, poem, **videos):
+        show_captions = captions and can_render(poem)
+        return components['editor'].create_video_with_audio(
+            video_path=str(videos[video_stage]),
+            audio_path=str(speech),
+            output_path=output_path,
+            captions=poem if show_captions else None,
+            caption_timings=speech_timings(speech) if show_captions else None
+        )
+
+    stages.append(Stage("edit", edit, deps=("speech", "poem", video_stage)))
+    return Pipeline(stages, limits=limits)
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+class ResponseCache:
+    def __init__(self, db_path=None, ttl=7 * 24 * 3600, max_entries=1000):
+        """
+        On-disk cache of model responses keyed by prompt and sampling parameters
+
+        Entries older than `ttl` seconds are treated as misses, and the least
+        recently used entries are evicted once the cache holds more than
+        `max_entries` responses.
+
+        Args:
+            db_path (str, optional): SQLite file path (default: cache/aria_responses.sqlite3)
+            ttl (float): Seconds an entry stays valid (default: 7 days)
+            max_entries (int): Maximum number of cached responses (default: 1000)
+        """
+        if db_path is None:
+            cache_dir = Path(__file__).parent / "cache"
+            cache_dir.mkdir(exist_ok=True)
+            db_path = cache_dir / "aria_responses.sqlite3"
+
+        self.db_path = str(db_path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                usage TEXT,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt, **params):
+        """
+        Build a cache key from the rendered prompt and sampling parameters
+
+        Args:
+            prompt (str): Fully rendered prompt
+            **params: Sampling parameters such as model, temperature, top_p, max_tokens and stop
+
+        Returns:
+            str: Hex SHA-256 digest
+        """
+        payload = json.dumps({"prompt": prompt, "params": params}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached response
+
+        Args:
+            key (str): Key from make_key
+
+        Returns:
+            dict: {'text': str, 'usage': dict or None}, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, usage, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or now - row[2] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+
+        return {
+            'text': row[0],
+            'usage': json.loads(row[1]) if row[1] else None
+        }
+
+    def set(self, key, text, usage=None):
+        """
+        Store a response, evicting least recently used entries past max_entries
+
+        Args:
+            key (str): Key from make_key
+            text (str): Response text
+            usage (dict, optional): Token usage reported by the API
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, text, usage, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, text, json.dumps(usage) if usage else None, now, now)
+            )
+            self._conn.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """Remove every cached response and reset the counters"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Get cache counters
+
+        Returns:
+            dict: hits, misses, hit_rate and number of stored entries
+        """
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries
+        }
@@ -0,0 +1,139 @@
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import Config
+
+
+def _http2_available():
+    """HTTP/2 in httpx needs the optional `h2` package"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class Transport:
+    def __init__(self, max_connections=None, max_keepalive=None, connect_timeout=None,
+                 read_timeout=None, http2=None, keepalive_expiry=30, retries=3):
+        """
+        Pooled, keep-alive HTTP clients shared by every external API client
+
+        Unset arguments fall back to the HTTP_* settings in Config.
+
+        Args:
+            max_connections (int, optional): Maximum open connections per client
+            max_keepalive (int, optional): Maximum idle connections kept alive per client
+            connect_timeout (float, optional): Seconds to wait for a connection
+            read_timeout (float, optional): Seconds to wait for response data
+            http2 (bool, optional): Negotiate HTTP/2 for httpx clients when `h2` is installed
+            keepalive_expiry (float): Seconds an idle connection is kept open (default: 30)
+            retries (int): Connection-level retries for idempotent requests.Session calls (default: 3)
+        """
+        self.max_connections = max_connections or Config.HTTP_MAX_CONNECTIONS
+        self.max_keepalive = max_keepalive or Config.HTTP_MAX_KEEPALIVE
+        self.connect_timeout = connect_timeout or Config.HTTP_CONNECT_TIMEOUT
+        self.read_timeout = read_timeout or Config.HTTP_READ_TIMEOUT
+        self.http2 = (Config.HTTP2 if http2 is None else http2) and _http2_available()
+        self.keepalive_expiry = keepalive_expiry
+        self.retries = retries
+        self._lock = threading.Lock()
+        self._http_client = None
+        self._session = None
+
+    @property
+    def timeout(self):
+        """(connect, read) timeout tuple for requests.Session calls"""
+        return (self.connect_timeout, self.read_timeout)
+
+    def _limits(self):
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    def _httpx_timeout(self):
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+    @property
+    def http_client(self):
+        """Shared httpx.Client, suitable for OpenAI(http_client=...)"""
+        with self._lock:
+            if self._http_client is None:
+                self._http_client = httpx.Client(
+                    limits=self._limits(),
+                    timeout=self._httpx_timeout(),
+                    http2=self.http2,
+                    follow_redirects=True
+                )
+            return self._http_client
+
+    def create_async_http_client(self):
+        """
+        Create an httpx.AsyncClient with the same pool settings
+
+        Async connections belong to the event loop that opened them, so each
+        async API client gets its own pool instead of sharing one.
+
+        Returns:
+            httpx.AsyncClient: New client, closed by its owner
+        """
+        return httpx.AsyncClient(
+            limits=self._limits(),
+            timeout=self._httpx_timeout(),
+            http2=self.http2,
+            follow_redirects=True
+        )
+
+    @property
+    def session(self):
+        """Shared requests.Session with a pooled, retrying adapter"""
+        with self._lock:
+            if self._session is None:
+                retry = Retry(
+                    total=self.retries,
+                    backoff_factor=0.5,
+                    status_forcelist=(502, 503, 504),
+                    allowed_methods=("GET", "HEAD")
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=self.max_keepalive,
+                    pool_maxsize=self.max_connections,
+                    max_retries=retry
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+            return self._session
+
+    def close(self):
+        """Close every pooled connection"""
+        with self._lock:
+            if self._http_client is not None:
+                self._http_client.close()
+                self._http_client = None
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+_default_transport = None
+_default_lock = threading.Lock()
+
+
+def get_transport():
+    """
+    Get the process-wide Transport, creating it on first use
+
+    Returns:
+        Transport: Shared transport
+    """
+    global _default_transport
+    with _default_lock:
+        if _default_transport is None:
+            _default_transport = Transport()
+        return _default_transport
@@ -1,43 +1,315 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import json
 from openai import OpenAI
 from dotenv import load_dotenv
 import os
+import re
+from ffmpeg_tools import run_ffmpeg
+from file_cache import FileCache, cache_key
+from transport import get_transport
+
+# Maximum number of characters accepted by audio.speech.create
+MAX_INPUT_CHARS = 4096
+# Raw PCM returned by the API for response_format="pcm": 24 kHz, 16-bit, mono
+PCM_SAMPLE_RATE = 24000
+PCM_BYTES_PER_SECOND = PCM_SAMPLE_RATE * 2
+
+
+def split_text(text, max_chars=MAX_INPUT_CHARS):
+    """
+    Split text into chunks on verse and sentence boundaries
+
+    Verses (blocks separated by blank lines) always start a new chunk.
+    Verses longer than `max_chars` are split between sentences, and
+    sentences longer than `max_chars` between words.
+
+    Args:
+        text (str): Text to split
+        max_chars (int): Maximum characters per chunk (default: 4096)
+
+    Returns:
+        list: Non-empty text chunks in reading order
+    """
+    chunks = []
+    for verse in re.split(r"\n\s*\n", text.strip()):
+        verse = verse.strip()
+        if not verse:
+            continue
+        if len(verse) <= max_chars:
+            chunks.append(verse)
+            continue
+
+        current = ""
+        for sentence in re.split(r"(?<=[.!?;:؟۔])\s+|\n", verse):
+            pieces = [sentence]
+            if len(sentence) > max_chars:
+                pieces = []
+                for word in sentence.split():
+                    if pieces and len(pieces[-1]) + len(word) + 1 <= max_chars:
+                        pieces[-1] += " " + word
+                    else:
+                        pieces.extend(word[i:i + max_chars] for i in range(0, len(word), max_chars))
+            for piece in pieces:
+                if current and len(current) + len(piece) + 1 > max_chars:
+                    chunks.append(current)
+                    current = ""
+                current = f"{current} {piece}".strip()
+        if current:
+            chunks.append(current)
+
+    return chunks
+
+
+def timings_path(audio_path):
+    """Path of the chunk timings saved next to a synthesized audio file"""
+    audio_path = Path(audio_path)
+    return audio_path.with_name(audio_path.stem + ".timings.json")
+
+
+def speech_timings(audio_path):
+    """
+    Load the chunk timings of audio made by generate_speech
+
+    Args:
+        audio_path (str or Path): Audio file
+
+    Returns:
+        list: (chunk text, duration in seconds) pairs in reading order, or None if the
+            audio was synthesized in one piece
+    """
+    try:
+        with open(timings_path(audio_path), encoding="utf-8") as f:
+            return [(chunk, seconds) for chunk, seconds in json.load(f)]
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+class SpeechStream:
+    def __init__(self, response_context, path, chunk_size, part_path=None, finalize=None):
+        """
+        Iterator that writes a streamed TTS response to disk as it arrives
+
+        Audio is written to `part_path` and moved to `path` once the response
+        is complete. Iterating yields the number of bytes written so far, so
+        callers can start playing `part_path` before synthesis finishes.
+
+        Args:
+            response_context: Context manager from audio.speech.with_streaming_response.create
+            path (Path): Final output path
+            chunk_size (int): Bytes read from the response per iteration
+            part_path (Path, optional): Where to write while streaming (default: path + '.part')
+            finalize (callable, optional): Moves the finished part file into place and returns
+                the final path, e.g. FileCache.put (default: rename to `path`)
+        """
+        self._response_context = response_context
+        self.path = Path(path)
+        self.part_path = Path(part_path) if part_path else self.path.with_name(self.path.name + ".part")
+        self.chunk_size = chunk_size
+        self._finalize = finalize
+        self.bytes_written = 0
+        self.done = False
+        self.cached = False
+
+    @classmethod
+    def from_path(cls, path):
+        """Wrap audio that already exists on disk (e.g. a cache hit) as a finished stream"""
+        stream = cls(None, path, 0)
+        stream.bytes_written = stream.path.stat().st_size
+        stream.done = True
+        stream.cached = True
+        return stream
+
+    def __iter__(self):
+        if self.done:
+            return
+
+        try:
+            with self._response_context as response, open(self.part_path, "wb") as f:
+                for data in response.iter_bytes(self.chunk_size):
+                    f.write(data)
+                    # Make the bytes visible to readers of part_path right away
+                    f.flush()
+                    self.bytes_written += len(data)
+                    yield self.bytes_written
+
+            if self._finalize:
+                self.path = self._finalize(self.part_path)
+            else:
+                os.replace(self.part_path, self.path)
+            self.done = True
+
+        except Exception as e:
+            if self.part_path.exists():
+                self.part_path.unlink()
+            raise Exception(f"Failed to generate speech: {str(e)}")
+
+    def wait(self):
+        """
+        Consume the whole stream
+
+        Returns:
+            Path: Path to the generated audio file
+        """
+        for _ in self:
+            pass
+        return self.path
+
 
 class TextToSpeech:
-    def __init__(self):
-        """Initialize the TTS generator with OpenAI client"""
+    def __init__(self, transport=None, cache=None, use_cache=True):
+        """
+        Initialize the TTS generator with OpenAI client
+
+        Args:
+            transport (Transport, optional): Pooled HTTP transport (default: shared transport)
+            cache (FileCache, optional): Audio cache (default: output/tts_cache, 500 MB)
+            use_cache (bool): Set to False to always synthesize into output/<filename>
+        """
         load_dotenv()
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.transport = transport or get_transport()
+        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'), http_client=self.transport.http_client)
+        self.model = "tts-1"
+        self.audio_format = "mp3"
         self.output_dir = Path(__file__).parent / "output"
         self.output_dir.mkdir(exist_ok=True)  # Create output directory if it doesn't exist
+        if use_cache and cache is None:
+            cache = FileCache(self.output_dir / "tts_cache")
+        self.cache = cache if use_cache else None
 
-    def generate_speech(self, text, filename="speech.mp3", voice="onyx"):
+    def _cache_key(self, text, voice):
+        """Cache key covering everything that determines the synthesized audio"""
+        return cache_key(text, voice, self.model, self.audio_format)
+
+    def generate_speech(self, text, filename="speech.mp3", voice="onyx", parallel=False, max_workers=4, chunk_chars=1000):
         """
         Generate speech from text
-        
+
+        Texts longer than the API input limit are always synthesized in chunks.
+        The duration of each chunk is saved next to the audio, see
+        speech_timings(), so captions can follow the narration.
+
+        With the audio cache enabled, audio is stored under a hash of the text,
+        voice, model and format, repeated requests skip the API, and the
+        returned path is that stable per-artifact path rather than `filename`.
+
         Args:
             text (str): Text to convert to speech
             filename (str): Output filename (default: speech.mp3)
             voice (str): Voice to use (default: onyx)
-            
+            parallel (bool): Synthesize verse/sentence chunks concurrently (default: False)
+            max_workers (int): Maximum concurrent requests in parallel mode (default: 4)
+            chunk_chars (int): Target chunk size in parallel mode (default: 1000)
+
         Returns:
             Path: Path to the generated audio file
         """
         try:
-            speech_file_path = self.output_dir / filename
-            
-            # Make the API call to generate the TTS audio
-            response = self.client.audio.speech.create(
-                model="tts-1",
-                voice=voice,
-                input=text
-            )
-
-            # Write the binary audio content to the file
-            with open(speech_file_path, "wb") as f:
-                f.write(response.content)
-            
-            return speech_file_path
+            if parallel or len(text) > MAX_INPUT_CHARS:
+                key = self._cache_key(text, voice)
+                if self.cache is not None:
+                    cached_path = self.cache.get(key, suffix=f".{self.audio_format}")
+                    if cached_path:
+                        return cached_path
+                    speech_file_path = self.cache.temp_path(key, suffix=f".{self.audio_format}")
+                else:
+                    speech_file_path = self.output_dir / filename
+
+                chunks = split_text(text, max_chars=min(chunk_chars, MAX_INPUT_CHARS) if parallel else MAX_INPUT_CHARS)
+                try:
+                    durations = self._synthesize_chunks(chunks, speech_file_path, voice, max_workers if parallel else 1)
+                except Exception:
+                    if self.cache is not None and speech_file_path.exists():
+                        speech_file_path.unlink()
+                    raise
+
+                if self.cache is not None:
+                    speech_file_path = self.cache.put(key, speech_file_path, suffix=f".{self.audio_format}")
+                self._save_timings(speech_file_path, chunks, durations)
+                return speech_file_path
+
+            # Stream the TTS audio straight to disk instead of buffering it
+            return self.stream_speech(text, filename=filename, voice=voice).wait()
 
         except Exception as e:
-            raise Exception(f"Failed to generate speech: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Failed to generate speech: {str(e)}")
+
+    def stream_speech(self, text, filename="speech.mp3", voice="onyx", chunk_size=16384):
+        """
+        Generate speech from text, writing audio to disk as it arrives
+
+        Args:
+            text (str): Text to convert to speech (at most MAX_INPUT_CHARS characters)
+            filename (str): Output filename (default: speech.mp3)
+            voice (str): Voice to use (default: onyx)
+            chunk_size (int): Bytes written per iteration (default: 16384)
+
+        Returns:
+            SpeechStream: Iterator of bytes written so far; `path` holds the audio once exhausted.
+                On a cache hit the stream is already finished and yields nothing.
+        """
+        if len(text) > MAX_INPUT_CHARS:
+            raise Exception(f"Failed to generate speech: text is longer than {MAX_INPUT_CHARS} characters, use generate_speech")
+
+        key = self._cache_key(text, voice)
+        suffix = f".{self.audio_format}"
+        if self.cache is not None:
+            cached_path = self.cache.get(key, suffix=suffix)
+            if cached_path:
+                return SpeechStream.from_path(cached_path)
+
+        response_context = self.client.audio.speech.with_streaming_response.create(
+            model=self.model,
+            voice=voice,
+            input=text,
+            response_format=self.audio_format
+        )
+
+        if self.cache is None:
+            return SpeechStream(response_context, self.output_dir / filename, chunk_size)
+        return SpeechStream(
+            response_context,
+            self.cache.path_for(key, suffix=suffix),
+            chunk_size,
+            part_path=self.cache.temp_path(key, suffix=suffix),
+            finalize=lambda part_path: self.cache.put(key, part_path, suffix=suffix)
+        )
+
+    def _save_timings(self, audio_path, chunks, durations):
+        """Write the chunk timings next to the audio, replacing any older ones atomically"""
+        path = timings_path(audio_path)
+        temp_path = path.with_name(f".{path.name}.tmp")
+        temp_path.write_text(json.dumps(list(zip(chunks, durations)), ensure_ascii=False), encoding="utf-8")
+        os.replace(temp_path, path)
+
+    def _synthesize_pcm(self, text, voice):
+        """Synthesize one chunk as raw PCM so chunks can be joined sample-exactly"""
+        response = self.client.audio.speech.create(
+            model=self.model,
+            voice=voice,
+            input=text,
+            response_format="pcm"
+        )
+        return response.content
+
+    def _synthesize_chunks(self, chunks, output_path, voice, max_workers):
+        """
+        Synthesize chunks with a bounded worker pool and encode them as one MP3
+
+        The chunks are concatenated as PCM before a single MP3 encode, so the
+        joins carry no encoder padding or extra headers.
+
+        Returns:
+            list: Duration in seconds of each chunk, in order
+        """
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            pcm_chunks = list(executor.map(lambda chunk: self._synthesize_pcm(chunk, voice), chunks))
+
+        run_ffmpeg(
+            [
+                "-f", "s16le", "-ar", PCM_SAMPLE_RATE, "-ac", 1, "-i", "pipe:0",
+                "-codec:a", "libmp3lame", "-b:a", "128k", output_path
+            ],
+            input_bytes=b"".join(pcm_chunks)
+        )
+        return [len(pcm) / PCM_BYTES_PER_SECOND for pcm in pcm_chunks]
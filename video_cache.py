@@ -0,0 +1,194 @@
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from pathlib import Path
+from file_cache import FileCache, cache_key
+from allegro import get_video_generator
+from video_downloader import VideoDownloader
+
+
+class VideoCache:
+    def __init__(self, generator, downloader, cache=None, download_limit=None):
+        """
+        Deduplicating cache of downloaded Allegro videos
+
+        Videos are stored under a hash of the generation parameters. Identical
+        requests that are already running, in this process or in the job
+        store, are joined instead of submitting another paid generation.
+
+        Args:
+            generator (VideoGenerator): Submits and polls Allegro jobs
+            downloader (VideoDownloader): Downloads finished videos
+            cache (FileCache, optional): Video storage (default: videos/allegro_cache, 2 GB)
+            download_limit (threading.Semaphore, optional): Held while downloading, to cap
+                concurrent downloads separately from generations (default: no limit)
+        """
+        self.generator = generator
+        self.downloader = downloader
+        self.cache = cache or FileCache(Path(downloader.output_dir) / "allegro_cache", max_bytes=2 * 1024 ** 3)
+        self.download_limit = download_limit
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(prompt, params):
+        return cache_key("allegro", prompt, params)
+
+    def _cached(self, key):
+        """Cached video for `key` if its content still matches the media store, else None"""
+        cached_path = self.cache.get(key, suffix=".mp4")
+        if cached_path is None:
+            return None
+        store = self.downloader.store
+        try:
+            if not store.verify_path(cached_path):
+                # Cached before downloads went through the media store
+                store.add(cached_path, target_path=cached_path)
+            return cached_path
+        except Exception as e:
+            # Corrupt: drop it so the video is downloaded again
+            print(f"Cached video {cached_path.name} is unusable: {str(e)}")
+            if cached_path.exists():
+                cached_path.unlink()
+            return None
+
+    def get_or_create(self, prompt, num_steps=100, cfg_scale=7.5, seed=100000,
+                      progress_callback=None, on_submit=None, tick=2):
+        """
+        Return the video for these parameters, generating it only if no one has yet
+
+        Args:
+            prompt (str): Description of the video to generate
+            num_steps (int): Number of generation steps
+            cfg_scale (float): Configuration scale
+            seed (int): Random seed for generation
+            progress_callback (callable, optional): Receives progress dicts while waiting,
+                see VideoGenerator.query_video_status
+            on_submit (callable, optional): Called with the request ID once the job is known
+            tick (float): Seconds between progress reports when joining another caller (default: 2)
+
+        Returns:
+            Path: Path to the cached video
+        """
+        params = {"num_steps": num_steps, "cfg_scale": cfg_scale, "seed": seed}
+        key = self._key(prompt, params)
+
+        cached_path = self._cached(key)
+        if cached_path:
+            return cached_path
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            owner = flight is None
+            if owner:
+                flight = {'future': Future(), 'request_id': None}
+                self._inflight[key] = flight
+
+        if not owner:
+            return self._join(flight, progress_callback, on_submit, tick)
+
+        try:
+            path = self._generate(key, prompt, params, flight, progress_callback, on_submit)
+            flight['future'].set_result(path)
+            return path
+        except Exception as e:
+            flight['future'].set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def resume(self, request_id, progress_callback=None):
+        """
+        Wait for an already submitted job and cache its video under the job's parameters
+
+        Args:
+            request_id (str): Request ID returned by Allegro
+            progress_callback (callable, optional): Receives progress dicts while waiting
+
+        Returns:
+            Path: Path to the cached video
+        """
+        video_url = self.generator.await_video(request_id, progress_callback=progress_callback)
+        job = self.generator.store.get(request_id)
+        if job and job['prompt']:
+            key = self._key(job['prompt'], job['params'])
+        else:
+            key = cache_key("allegro-request", request_id)
+
+        cached_path = self._cached(key)
+        if cached_path:
+            return cached_path
+        return self._download(key, video_url)
+
+    def _join(self, flight, progress_callback, on_submit, tick):
+        """Wait for the caller that owns an identical in-flight request"""
+        notified = False
+        while True:
+            request_id = flight['request_id']
+            if request_id and on_submit and not notified:
+                on_submit(request_id)
+                notified = True
+            try:
+                return flight['future'].result(timeout=tick)
+            except FutureTimeoutError:
+                progress = self.generator.poller.progress(request_id) if request_id else None
+                if progress_callback and progress:
+                    progress_callback(progress)
+
+    def _generate(self, key, prompt, params, flight, progress_callback, on_submit):
+        """Find or submit the Allegro job, wait for it and move the download into the cache"""
+        job = self.generator.store.find(prompt, params)
+
+        if job and job['status'] == 'completed':
+            try:
+                return self._download(key, job['video_url'])
+            except Exception as e:
+                # Result URLs can expire; fall back to a fresh generation
+                print(f"Cached job {job['request_id']} could not be downloaded: {str(e)}")
+                job = None
+
+        if job:
+            # Another process already submitted this generation
+            request_id = job['request_id']
+        else:
+            request_id = self.generator.submit(prompt, **params)
+
+        flight['request_id'] = request_id
+        if on_submit:
+            on_submit(request_id)
+
+        video_url = self.generator.await_video(request_id, progress_callback=progress_callback)
+        return self._download(key, video_url)
+
+    def _download(self, key, video_url):
+        temp_name = self.cache.temp_path(key, suffix=".mp4").name
+        if self.download_limit is None:
+            video_path = self.downloader.download_video(url=video_url, filename=temp_name)
+        else:
+            with self.download_limit:
+                video_path = self.downloader.download_video(url=video_url, filename=temp_name)
+        path = self.cache.put(key, video_path, suffix=".mp4")
+        # Evicted cache entries were only links; drop blobs nothing points to any more
+        self.downloader.store.prune()
+        return path
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_video_cache():
+    """
+    Get the process-wide VideoCache, creating it on first use
+
+    Single-flight only covers callers of the same VideoCache, so every page
+    shares this one; it wraps the shared VideoGenerator.
+
+    Returns:
+        VideoCache: Shared video cache
+    """
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = VideoCache(get_video_generator(), VideoDownloader())
+        return _default_cache
@@ -1,24 +1,95 @@
+import glob
+import hashlib
 import requests
+import urllib3
 from pathlib import Path
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from tqdm import tqdm
+from config import Config
+from media_store import get_media_store, new_hasher, digest_file
+from transport import get_transport
+
+# Bounds for the adaptive read size and the time one read should take
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+CHUNK_TARGET_SECONDS = 0.25
+
+# Segmented downloads do not split files into pieces smaller than this
+MIN_SEGMENT_SIZE = 8 * 1024 * 1024
+
+_pwrite_lock = threading.Lock()
+
+
+def _pwrite(fd, data, offset):
+    """Write `data` at `offset` without moving a shared file position"""
+    if hasattr(os, 'pwrite'):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+        return
+    # No positional writes on Windows: serialize seek + write instead
+    with _pwrite_lock:
+        os.lseek(fd, offset, os.SEEK_SET)
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
 
 class VideoDownloader:
-    def __init__(self):
-        """Initialize the Video Downloader"""
+    def __init__(self, transport=None, segments=None, store=None):
+        """
+        Initialize the Video Downloader
+
+        Args:
+            transport (Transport, optional): Pooled HTTP transport (default: shared transport)
+            segments (int, optional): Default concurrent connections per download
+                                    (default: Config.DOWNLOAD_SEGMENTS)
+            store (MediaStore, optional): Content-addressed storage for downloads
+                                    (default: the shared store in videos/store)
+        """
+        self.transport = transport or get_transport()
+        self.segments = segments or Config.DOWNLOAD_SEGMENTS
+        self.session = self.transport.session
         self.output_dir = Path(__file__).parent / "videos"
         self.output_dir.mkdir(exist_ok=True)  # Create videos directory if it doesn't exist
+        self.store = store or get_media_store(self.output_dir / "store")
 
-    def download_video(self, url, filename=None):
+    def download_video(self, url, filename=None, progress_callback=None, max_retries=5, segments=None,
+                       min_segment_size=MIN_SEGMENT_SIZE):
         """
         Download video from URL
-        
+
+        The file is written to a `.part` file named after the filename and a
+        hash of the URL, and renamed once complete. If the connection drops,
+        or a `.part` file of the same URL is left over from an earlier attempt,
+        the download continues from where it stopped using an HTTP Range
+        request. Leftovers from other URLs under the same filename are deleted
+        rather than resumed.
+
+        Finished downloads are hashed while they stream and kept once in the
+        media store; `filename` becomes a hard link to the stored blob, so
+        identical videos share disk space and replacing a name never disturbs
+        a reader of the previous file.
+
+        With `segments` > 1 the file is fetched as that many concurrent Range
+        requests written into a preallocated file. Servers that do not
+        support ranges, and files too small to split, use a single stream.
+
         Args:
             url (str): URL of the video to download
             filename (str, optional): Custom filename for the video
                                     If None, uses timestamp
-        
+            progress_callback (callable, optional): Called with (bytes_done, total_bytes) after
+                every chunk instead of drawing a tqdm bar; total_bytes is 0 when unknown
+            max_retries (int): Reconnect attempts after a dropped connection (default: 5)
+            segments (int, optional): Concurrent connections to download with (default: self.segments)
+            min_segment_size (int): Smallest segment worth its own connection in bytes (default: 8 MiB)
+
         Returns:
             Path: Path to the downloaded video file
         """
@@ -27,40 +98,269 @@ class VideoDownloader:
             if filename is None:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 filename = f"video_{timestamp}.mp4"
-            
+
             # Ensure filename has .mp4 extension
             if not filename.endswith('.mp4'):
                 filename += '.mp4'
-            
-            # Full path for the video
+
+            # Full path for the video and for the partial download; the partial file is
+            # tied to the URL so a different video never resumes it
             video_path = self.output_dir / filename
-            
-            # Download the video
+            url_key = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+            part_path = video_path.with_name(f"{video_path.name}.{url_key}.part")
+            validator_path = part_path.with_name(part_path.name + '.validator')
+            self._remove_stale_parts(video_path, keep=(part_path, validator_path))
+
             print(f"Downloading video from {url}")
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            
-            # Get total file size for progress tracking
-            total_size = int(response.headers.get('content-length', 0))
-            
-            # Write the file with progress tracking
-            with open(video_path, 'wb') as file, tqdm(
-                desc=filename,
-                total=total_size,
-                unit='iB',
-                unit_scale=True,
-                unit_divisor=1024,
-            ) as progress_bar:
-                for data in response.iter_content(chunk_size=1024):
-                    size = file.write(data)
-                    progress_bar.update(size)
-            
+            progress_bar = None
+            if progress_callback is None:
+                progress_bar = tqdm(desc=filename, unit='iB', unit_scale=True, unit_divisor=1024)
+
+            try:
+                segments = segments or self.segments
+                total = self._probe_ranges(url) if segments > 1 else None
+                if total and total >= 2 * min_segment_size:
+                    segments = min(segments, total // min_segment_size)
+                    segment_path = video_path.with_name(f"{video_path.name}.{url_key}.segments.part")
+                    try:
+                        self._download_segments(url, segment_path, total, segments, max_retries,
+                                                progress_bar, progress_callback)
+                    except BaseException:
+                        # The file is preallocated to full size and cannot be resumed, so
+                        # don't leave it behind
+                        if segment_path.exists():
+                            segment_path.unlink()
+                        raise
+                    # Segments arrive out of order, so the finished file is hashed in one pass
+                    self.store.add(segment_path, target_path=video_path)
+                    print(f"Video downloaded successfully to: {video_path}")
+                    return video_path
+
+                # The ETag or Last-Modified seen when the .part file was started, sent as
+                # If-Range so a changed file on the server is fetched from the start
+                state = {'validator': None, 'hasher': None, 'validator_path': validator_path}
+                if part_path.exists() and validator_path.exists():
+                    state['validator'] = validator_path.read_text(encoding='utf-8').strip() or None
+                attempt = 0
+                while True:
+                    try:
+                        self._download_range(url, part_path, state, progress_bar, progress_callback)
+                        break
+                    except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+                        attempt += 1
+                        if attempt > max_retries:
+                            raise
+                        done = part_path.stat().st_size if part_path.exists() else 0
+                        print(f"Download interrupted at {done} bytes ({str(e)}), resuming...")
+                        time.sleep(min(2 ** (attempt - 1), 10))
+            finally:
+                if progress_bar is not None:
+                    progress_bar.close()
+
+            self.store.add(part_path, digest=state['hasher'].hexdigest(), target_path=video_path)
+            if validator_path.exists():
+                validator_path.unlink()
             print(f"Video downloaded successfully to: {video_path}")
             return video_path
-            
+
         except Exception as e:
             raise Exception(f"Failed to download video: {str(e)}")
 
+    def _download_range(self, url, part_path, state, progress_bar, progress_callback):
+        """
+        Append the rest of the file to `part_path`
+
+        Args:
+            state (dict): 'validator' is the ETag or Last-Modified used as If-Range when
+                resuming and is saved to 'validator_path'; 'hasher' is left holding the hash
+                of the whole .part file
+        """
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        headers = {}
+        if offset:
+            headers['Range'] = f"bytes={offset}-"
+            if state['validator']:
+                # If the file changed on the server, it answers with the whole new file
+                headers['If-Range'] = state['validator']
+
+        with self.session.get(url, stream=True, headers=headers, timeout=self.transport.timeout) as response:
+            if response.status_code == 416 and offset:
+                if self._range_total(response) == offset:
+                    # Nothing left past the end of the .part file
+                    state['hasher'] = new_hasher()
+                    digest_file(part_path, state['hasher'])
+                    return
+                # The .part file doesn't match the size on the server (or the server
+                # didn't say), so it can't be trusted: start over
+                response.close()
+                part_path.unlink()
+                if state['validator_path'].exists():
+                    state['validator_path'].unlink()
+                state['validator'] = None
+                return self._download_range(url, part_path, state, progress_bar, progress_callback)
+            response.raise_for_status()
+
+            if offset and response.status_code != 206:
+                # Range ignored (or the file changed), start over
+                offset = 0
+            total = self._total_size(response, offset)
+            validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+            if validator and validator != state['validator']:
+                state['validator'] = validator
+                state['validator_path'].write_text(validator, encoding='utf-8')
+
+            # Hash what is already on disk, then everything as it arrives
+            hasher = state['hasher'] = new_hasher()
+            if offset:
+                digest_file(part_path, hasher)
+
+            if progress_bar is not None:
+                progress_bar.reset(total=total or None)
+                progress_bar.update(offset)
+
+            done = offset
+            chunk_size = MIN_CHUNK_SIZE
+            with open(part_path, 'ab' if offset else 'wb') as file:
+                while True:
+                    started = time.perf_counter()
+                    data = response.raw.read(chunk_size, decode_content=True)
+                    if not data:
+                        break
+                    elapsed = time.perf_counter() - started
+                    file.write(data)
+                    hasher.update(data)
+                    done += len(data)
+
+                    if progress_bar is not None:
+                        progress_bar.update(len(data))
+                    if progress_callback is not None:
+                        progress_callback(done, total)
+
+                    # Grow the chunk while reads fill it quickly, shrink it when reads stall,
+                    # so per-chunk overhead stays small without holding huge buffers
+                    if len(data) == chunk_size and elapsed < CHUNK_TARGET_SECONDS / 2:
+                        chunk_size = min(chunk_size * 2, MAX_CHUNK_SIZE)
+                    elif elapsed > CHUNK_TARGET_SECONDS * 2:
+                        chunk_size = max(chunk_size // 2, MIN_CHUNK_SIZE)
+
+        if total and done < total:
+            raise requests.ConnectionError(f"Connection closed after {done} of {total} bytes")
+
+    def _remove_stale_parts(self, video_path, keep):
+        """Delete partial downloads of `video_path` other than those in `keep`"""
+        pattern = glob.escape(video_path.name) + ".*.part*"
+        for path in video_path.parent.glob(pattern):
+            if path not in keep:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def _probe_ranges(self, url):
+        """
+        Ask for the first byte to learn whether the server supports ranges
+
+        Returns:
+            int: Full size of the file, or None if ranges are not supported
+        """
+        try:
+            with self.session.get(url, stream=True, headers={'Range': 'bytes=0-0'},
+                                  timeout=self.transport.timeout) as response:
+                response.raise_for_status()
+                accepts = response.headers.get('Accept-Ranges', '').lower()
+                if response.status_code != 206 or accepts == 'none':
+                    return None
+                return self._total_size(response, 0) or None
+        except requests.RequestException:
+            return None
+
+    def _download_segments(self, url, path, total, segments, max_retries, progress_bar, progress_callback):
+        """
+        Fetch `total` bytes as `segments` concurrent Range requests into a preallocated file
+
+        Each segment is written at its own offset with positional writes and
+        retried from its last written byte if its connection drops.
+        """
+        with open(path, 'wb') as file:
+            file.truncate(total)
+
+        bounds = [total * index // segments for index in range(segments + 1)]
+        progress_lock = threading.Lock()
+        done = [0]
+        if progress_bar is not None:
+            progress_bar.reset(total=total)
+
+        def report(size):
+            with progress_lock:
+                done[0] += size
+                if progress_bar is not None:
+                    progress_bar.update(size)
+                if progress_callback is not None:
+                    progress_callback(done[0], total)
+
+        fd = os.open(path, os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            with ThreadPoolExecutor(max_workers=segments) as executor:
+                futures = [
+                    executor.submit(self._download_segment, url, fd, bounds[index], bounds[index + 1] - 1,
+                                    max_retries, report)
+                    for index in range(segments)
+                ]
+                for future in futures:
+                    future.result()
+        finally:
+            os.close(fd)
+
+        if done[0] != total or os.path.getsize(path) != total:
+            raise Exception(f"Segmented download wrote {done[0]} of {total} bytes")
+
+    def _download_segment(self, url, fd, start, end, max_retries, report):
+        """Write bytes start..end (inclusive) of the file at the same offsets in `fd`"""
+        position = start
+        attempt = 0
+        while position <= end:
+            try:
+                with self.session.get(url, stream=True, headers={'Range': f"bytes={position}-{end}"},
+                                      timeout=self.transport.timeout) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise Exception(f"Server ignored the range request for bytes {position}-{end}")
+                    chunk_size = MIN_CHUNK_SIZE
+                    while position <= end:
+                        data = response.raw.read(min(chunk_size, end - position + 1), decode_content=True)
+                        if not data:
+                            break
+                        _pwrite(fd, data, position)
+                        position += len(data)
+                        report(len(data))
+                        chunk_size = min(chunk_size * 2, MAX_CHUNK_SIZE)
+                if position <= end:
+                    raise requests.ConnectionError(f"Segment closed at byte {position} of {start}-{end}")
+            except (requests.RequestException, urllib3.exceptions.HTTPError):
+                attempt += 1
+                if attempt > max_retries:
+                    raise
+                time.sleep(min(2 ** (attempt - 1), 10))
+
+    @staticmethod
+    def _range_total(response):
+        """Full file size from a 416 response's `Content-Range: bytes */N`, or None"""
+        content_range = response.headers.get('Content-Range', '')
+        unit, _, total = content_range.partition(' ')
+        length = total.rpartition('/')[2]
+        if unit != 'bytes' or not length.isdigit():
+            return None
+        return int(length)
+
+    @staticmethod
+    def _total_size(response, offset):
+        """Full size of the file from Content-Range or Content-Length, 0 if unknown"""
+        content_range = response.headers.get('Content-Range', '')
+        if '/' in content_range and not content_range.endswith('/*'):
+            return int(content_range.rsplit('/', 1)[1])
+        length = int(response.headers.get('Content-Length', 0))
+        return offset + length if length else 0
+
     def get_video_info(self, video_path):
         """
         Get basic information about the downloaded video
@@ -72,12 +372,14 @@ class VideoDownloader:
             dict: Video information
         """
         try:
+            video_path = Path(video_path)
             file_size = os.path.getsize(video_path)
             return {
                 'path': video_path,
                 'size_bytes': file_size,
                 'size_mb': file_size / (1024 * 1024),  # Convert to MB
-                'filename': video_path.name
+                'filename': video_path.name,
+                'digest': self.store.digest_for(video_path)  # SHA-256 of the content
             }
         except Exception as e:
             raise Exception(f"Failed to get video info: {str(e)}")
\ No newline at end of file
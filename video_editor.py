@@ -1,111 +1,591 @@
 import cv2
 import numpy as np
-from moviepy.editor import VideoFileClip, AudioFileClip, concatenate_videoclips
+import math
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from config import Config
+from file_cache import FileCache, cache_key
+from media_store import digest_file, link_or_copy
+from captions import CaptionOverlay, CaptionTrack
+from frames import (FrameSpool, DEFAULT_MEMORY_LIMIT, ping_pong_indices, resample_indices, seamless_loop_indices,
+                    timeline_indices)
+from ffmpeg_tools import FrameWriter, media_duration, run_ffmpeg
+
+# Segments shorter than this are not worth a process of their own
+MIN_SEGMENT_SECONDS = 1.0
+
+# How a clip is turned into one loop: forward then backward, or cut at its most seamless point
+LOOP_MODES = ("ping_pong", "seamless")
+
+
+def _concat_line(path):
+    """One entry of an ffmpeg concat demuxer list"""
+    return "file '{}'\n".format(str(Path(path).resolve()).replace("'", "'\\''"))
+
+
+def _encode_segment(spool_info, indices, output_path, encoder_args, fps=None):
+    """Encode frames of a spill file in the given order; runs in a worker process"""
+    spool = FrameSpool.attach(**spool_info)
+    with FrameWriter(output_path, spool.width, spool.height, fps or spool.fps, encoder_args) as writer:
+        for block in spool.gather(indices):
+            writer.write(block)
+    return writer.frames_written
+
+
+class RenderSettings:
+    def __init__(self, height=None, fps=None, preset="medium", crf=23, max_duration=None, audio_bitrate="192k"):
+        """
+        Output quality of a render
+
+        Args:
+            height (int, optional): Downscale to this height (default: source resolution)
+            fps (float, optional): Reduce to this frame rate (default: source frame rate)
+            preset (str): libx264 speed preset (default: medium)
+            crf (int): libx264 constant rate factor, lower is better quality (default: 23)
+            max_duration (float, optional): Cut the output after this many seconds
+            audio_bitrate (str): AAC bitrate (default: 192k)
+        """
+        self.height = height
+        self.fps = fps
+        self.preset = preset
+        self.crf = crf
+        self.max_duration = max_duration
+        self.audio_bitrate = audio_bitrate
+
+    def video_key(self):
+        """Settings that affect the encoded video frames, for cache keys"""
+        return {'height': self.height, 'fps': self.fps, 'args': self.video_args()}
+
+    def key(self):
+        """Every setting that affects the rendered file, for cache keys"""
+        return {**self.video_key(), 'max_duration': self.max_duration, 'audio_args': self.audio_args()}
+
+    @classmethod
+    def preview(cls, max_duration=None):
+        """Draft quality that renders in seconds: 360p, 12 fps, ultrafast preset"""
+        return cls(height=360, fps=12, preset="ultrafast", crf=32, max_duration=max_duration, audio_bitrate="96k")
+
+    def video_args(self):
+        """ffmpeg output arguments for the video encode; yuv420p needs even dimensions"""
+        return [
+            "-vf", "scale=trunc(iw/2)*2:trunc(ih/2)*2",
+            "-c:v", "libx264", "-preset", self.preset, "-crf", self.crf,
+            "-pix_fmt", "yuv420p", "-movflags", "+faststart"
+        ]
+
+    def audio_args(self):
+        """ffmpeg output arguments for the audio encode"""
+        return ["-c:a", "aac", "-b:a", self.audio_bitrate]
+
+
+class RenderPlan:
+    def __init__(self, video_path, audio_path, loop="ping_pong", crossfade=0.0, captions=None, caption_timings=None):
+        """
+        Decisions shared by the preview and final render of one video/audio pair
+
+        The loop is worked out by the first render and reused by later ones,
+        so finalizing after a preview does not repeat that work.
+
+        Args:
+            video_path (str): Path to input video
+            audio_path (str): Path to audio file
+            loop (str): "ping_pong" plays the clip forward then backward; "seamless" cuts it
+                at the frame that best matches an earlier one, which halves the frames to encode;
+                clips without a clean match fall back to ping-pong
+            crossfade (float): Seconds blended across the seam of a seamless loop (default: 0)
+            captions (str, optional): Poem text to burn into the video, one line at a time
+            caption_timings (list, optional): (chunk text, seconds) pairs from tts.speech_timings()
+                to time the captions with; without them lines are timed by character count
+        """
+        if loop not in LOOP_MODES:
+            raise ValueError(f"Unknown loop mode {loop!r}, expected one of {', '.join(LOOP_MODES)}")
+        self.video_path = str(video_path)
+        self.audio_path = str(audio_path)
+        self.audio_duration = media_duration(audio_path)
+        self.loop = loop
+        self.crossfade = crossfade if loop == "seamless" else 0.0
+        self.unit = None  # Source frame indices of one loop, set by the first render
+        self.source_fps = None
+        self.captions = None
+        if captions:
+            self.captions = CaptionTrack.from_text(captions, self.audio_duration, caption_timings)
+
+    def loop_key(self):
+        """Part of the cache keys that identifies how the loop is built"""
+        return (self.loop, self.crossfade)
+
+    def caption_key(self):
+        """Part of the cache keys that identifies the burned-in captions"""
+        return self.captions.key() if self.captions is not None else None
+
+    def duration(self, settings):
+        """Output length for the given settings"""
+        if settings.max_duration:
+            return min(self.audio_duration, settings.max_duration)
+        return self.audio_duration
+
 
 class VideoEditor:
-    def __init__(self):
-        """Initialize the Video Editor"""
+    def __init__(self, memory_limit=DEFAULT_MEMORY_LIMIT, workers=None, cache=None, use_cache=True):
+        """
+        Initialize the Video Editor
+
+        Args:
+            memory_limit (int): Maximum bytes of decoded frames held in memory at once (default: 256 MB)
+            workers (int, optional): Processes encoding segments in parallel (default: Config.RENDER_WORKERS)
+            cache (FileCache, optional): Render cache (default: output/render_cache, 2 GB)
+            use_cache (bool): Set to False to always render from scratch
+        """
         self.output_dir = Path(__file__).parent / "output"
         self.output_dir.mkdir(exist_ok=True)
+        self.memory_limit = memory_limit
+        self.workers = workers or Config.RENDER_WORKERS
+        if use_cache and cache is None:
+            cache = FileCache(self.output_dir / "render_cache", max_bytes=2 * 1024 * 1024 * 1024)
+        self.cache = cache if use_cache else None
+        self._digests = {}
+
+    def _digest(self, path):
+        """Content digest of an input file, remembered until the file changes"""
+        info = os.stat(path)
+        signature = (str(path), info.st_ino, info.st_size, info.st_mtime_ns)
+        if signature not in self._digests:
+            self._digests[signature] = digest_file(path)
+        return self._digests[signature]
+
+    def _artifact(self, key_parts, output_path, build):
+        """
+        Produce a file with build(path), or reuse it from the render cache
+
+        Files are built under a temporary name and then linked or moved to
+        output_path, so a render never writes into a file that is shared
+        with the cache.
+
+        Args:
+            key_parts (tuple): Everything the file depends on, for cache_key
+            output_path (str): Where the file should end up
+            build (callable): Writes the file to the path it is given
+
+        Returns:
+            tuple: (output_path, whether it came from the cache)
+        """
+        if self.cache is not None:
+            key = cache_key(*key_parts)
+            cached_path = self.cache.get(key, suffix=".mp4")
+            if cached_path is not None:
+                return str(link_or_copy(cached_path, output_path)), True
+            temp_path = self.cache.temp_path(key, suffix=".mp4")
+        else:
+            temp_path = self.output_dir / f".render_{uuid.uuid4().hex}.mp4"
+
+        try:
+            build(str(temp_path))
+            if self.cache is not None:
+                link_or_copy(self.cache.put(key, temp_path, suffix=".mp4"), output_path)
+            else:
+                os.replace(temp_path, output_path)
+            return str(output_path), False
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
 
     def reverse_video(self, video_path, output_path):
         """
         Reverse a video
-        
+
+        Frames are decoded once into a temporary spill file and written back
+        block by block from the end, so at most `memory_limit` bytes of
+        frames are in memory however long the clip is.
+
         Args:
             video_path (str): Path to input video
             output_path (str): Path for reversed video
         """
+        def build(path):
+            with FrameSpool(video_path, memory_limit=self.memory_limit, directory=self.output_dir) as spool:
+                # Write reversed frames
+                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                out = cv2.VideoWriter(path, fourcc, spool.fps, (spool.width, spool.height))
+                try:
+                    for frame in spool.iter_frames(reverse=True):
+                        out.write(frame)
+                finally:
+                    out.release()
+
         try:
-            # Open the original video
-            cap = cv2.VideoCapture(video_path)
-            
-            # Get properties
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            
-            # Read frames into a list
-            frames = []
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                frames.append(frame)
-            
-            cap.release()
-
-            # Write reversed frames
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-
-            for frame in reversed(frames):
-                out.write(frame)
-
-            out.release()
-            
+            self._artifact(("reversed", self._digest(video_path)), output_path, build)
+
         except Exception as e:
             raise Exception(f"Failed to reverse video: {str(e)}")
 
-    def create_video_with_audio(self, video_path, audio_path, output_path=None):
+    def encode_frames(self, spool, indices, output_path, workers=None, encoder_args=None, fps=None):
+        """
+        Encode spooled frames in the given order, split across worker processes
+
+        The timeline is cut into one contiguous segment per worker. Every
+        segment is an independent libx264 encode starting on a keyframe,
+        and the segments are joined losslessly with the concat demuxer.
+
+        Args:
+            spool (FrameSpool): Decoded source frames
+            indices (sequence): Source frame index for each output frame
+            output_path (str): Path for the encoded video
+            workers (int, optional): Encoder processes (default: self.workers)
+            encoder_args (list, optional): ffmpeg output arguments for each segment
+                (default: RenderSettings().video_args())
+            fps (float, optional): Output frame rate (default: source frame rate)
+
+        Returns:
+            int: Number of frames encoded
+        """
+        workers = workers or self.workers
+        encoder_args = encoder_args or RenderSettings().video_args()
+        fps = fps or spool.fps
+        min_frames = max(1, int(MIN_SEGMENT_SECONDS * fps))
+        segments = max(1, min(workers, len(indices) // min_frames))
+        if segments == 1:
+            return _encode_segment(spool.info(), indices, output_path, encoder_args, fps)
+
+        # Each encoder gets its share of the cores instead of all of them
+        threads = max(1, (os.cpu_count() or 1) // segments)
+        segment_args = [*encoder_args, "-threads", threads]
+        bounds = [len(indices) * index // segments for index in range(segments + 1)]
+        stem = self.output_dir / f".segment_{uuid.uuid4().hex}"
+        paths = [f"{stem}_{index}.mp4" for index in range(segments)]
+        list_path = Path(f"{stem}.txt")
+        try:
+            # Forking a process that runs Streamlit and HTTP threads can copy a held lock into
+            # the child, so workers start from a clean interpreter instead
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            with ProcessPoolExecutor(max_workers=segments, mp_context=multiprocessing.get_context(method)) as executor:
+                futures = [
+                    executor.submit(_encode_segment, spool.info(), indices[bounds[index]:bounds[index + 1]],
+                                    paths[index], segment_args, fps)
+                    for index in range(segments)
+                ]
+                frames = sum(future.result() for future in futures)
+
+            list_path.write_text("".join(_concat_line(path) for path in paths), encoding="utf-8")
+            run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy",
+                        "-movflags", "+faststart", output_path])
+            return frames
+        finally:
+            for path in [*paths, list_path]:
+                if os.path.exists(path):
+                    os.unlink(path)
+
+    def encode_loop_unit(self, video_path, output_path, workers=None, settings=None, plan=None):
+        """
+        Encode one loop of a clip
+
+        By default this is a forward-then-backward pass; a plan can ask for
+        a seamless loop instead. Frames are piped straight from the frame
+        spool into libx264. The turnaround frames are not repeated, so the
+        unit loops without a stutter.
+
+        Args:
+            video_path (str): Path to input video
+            output_path (str): Path for the loop unit
+            workers (int, optional): Encoder processes (default: self.workers)
+            settings (RenderSettings, optional): Output quality (default: full quality)
+            plan (RenderPlan, optional): Reuses, or records, the loop worked out for this clip
+
+        Returns:
+            float: Duration of the loop unit in seconds
+        """
+        settings = settings or RenderSettings()
+        try:
+            with self._spool(video_path, settings) as spool:
+                indices, fps = self._loop_indices(spool, settings, plan)
+                frames = self.encode_frames(spool, indices, output_path, workers,
+                                            encoder_args=settings.video_args(), fps=fps)
+                return frames / fps
+
+        except Exception as e:
+            raise Exception(f"Failed to encode loop unit: {str(e)}")
+
+    def encode_timeline(self, plan, output_path, settings=None):
+        """
+        Encode every frame of the output and mux the audio in one ffmpeg pass
+
+        Source frames are decoded once into the frame spool and piped, in
+        timeline order, straight into a single ffmpeg process that also
+        reads the audio. No intermediate video files are written and
+        nothing is decoded twice. Captions of the plan are composited onto
+        each block of frames on the way, see CaptionOverlay. This path always
+        uses one encoder process; self.workers only applies to encode_frames().
+
+        Args:
+            plan (RenderPlan): Plan from plan()
+            output_path (str): Path for output video
+            settings (RenderSettings, optional): Output quality (default: full quality)
+
+        Returns:
+            int: Number of frames encoded
+        """
+        settings = settings or RenderSettings()
+        duration = plan.duration(settings)
+        with self._spool(plan.video_path, settings) as spool:
+            unit, fps = self._loop_indices(spool, settings, plan)
+            indices = timeline_indices(unit, max(1, math.ceil(duration * fps)))
+            output_args = [
+                "-map", "0:v:0", "-map", "1:a:0",
+                *settings.video_args(), *settings.audio_args(),
+                "-t", f"{duration:.3f}"
+            ]
+            overlay = None
+            if plan.captions is not None:
+                overlay = CaptionOverlay(plan.captions, spool.width, spool.height)
+            with FrameWriter(output_path, spool.width, spool.height, fps, output_args,
+                             extra_inputs=["-i", plan.audio_path]) as writer:
+                for block in spool.gather(indices):
+                    if overlay is not None:
+                        # gather() hands out its own buffer, so the captions are drawn in place
+                        overlay.apply(block, (writer.frames_written + np.arange(len(block))) / fps)
+                    writer.write(block)
+            return writer.frames_written
+
+    def _spool(self, video_path, settings):
+        spool = FrameSpool(video_path, memory_limit=self.memory_limit, directory=self.output_dir,
+                           max_height=settings.height)
+        if spool.frame_count == 0:
+            spool.close()
+            raise Exception(f"No frames could be decoded from {video_path}")
+        return spool
+
+    def _loop_indices(self, spool, settings, plan=None):
+        """Source frame indices of one loop at the output frame rate, and that rate"""
+        unit = plan.unit if plan is not None else None
+        if unit is None and plan is not None and plan.loop == "seamless":
+            unit = seamless_loop_indices(spool, crossfade_frames=round(plan.crossfade * spool.fps))
+            if unit is None:
+                print("No clean loop point in this clip, using ping-pong")
+        if unit is None:
+            unit = ping_pong_indices(spool.frame_count)
+        if plan is not None:
+            plan.unit, plan.source_fps = unit, spool.fps
+        fps = min(settings.fps or spool.fps, spool.fps)
+        return resample_indices(unit, spool.fps, fps), fps
+
+    def mux_audio(self, video_path, audio_path, output_path, duration=None, audio_args=None):
+        """
+        Replace the audio of a rendered video, stream copying its video track
+
+        Args:
+            video_path (str): Rendered video at least `duration` seconds long
+            audio_path (str): Path to the new audio file
+            output_path (str): Path for output video
+            duration (float, optional): Output length in seconds (default: length of the audio)
+            audio_args (list, optional): ffmpeg audio encoder arguments (default: AAC at 192k)
+        """
+        duration = duration or media_duration(audio_path)
+        audio_args = audio_args or RenderSettings().audio_args()
+        run_ffmpeg([
+            "-i", video_path,
+            "-i", audio_path,
+            "-map", "0:v:0", "-map", "1:a:0",
+            "-c:v", "copy", *audio_args,
+            "-t", f"{duration:.3f}",
+            "-movflags", "+faststart",
+            output_path
+        ])
+
+    def _video_track(self, track_key, duration):
+        """Cached render whose video track covers `duration` seconds, or None"""
+        if self.cache is None:
+            return None
+        track_path = self.cache.get(cache_key(*track_key), suffix=".mp4")
+        if track_path is None or media_duration(track_path) < duration:
+            return None
+        return str(track_path)
+
+    def _remember_track(self, track_key, output_path, duration):
+        """Keep a render as the video track for its clip and settings unless a longer one is kept"""
+        if self.cache is None:
+            return
+        key = cache_key(*track_key)
+        existing = self.cache.path_for(key, suffix=".mp4")
+        if existing.exists() and media_duration(existing) >= duration:
+            return
+        # A hard link to the render, so the track costs no extra disk
+        temp_path = self.cache.temp_path(key, suffix=".mp4")
+        link_or_copy(output_path, temp_path)
+        self.cache.put(key, temp_path, suffix=".mp4")
+
+    def loop_to_audio(self, unit_path, unit_duration, audio_path, output_path, duration=None, audio_args=None):
+        """
+        Repeat an encoded loop unit to the length of the audio and mux the audio in
+
+        The unit is listed as many times as needed in an ffmpeg concat list
+        and stream copied, so no video frames are re-encoded; only the audio
+        is encoded to AAC.
+
+        Args:
+            unit_path (str): Encoded loop unit
+            unit_duration (float): Duration of the loop unit in seconds
+            audio_path (str): Path to audio file
+            output_path (str): Path for output video
+            duration (float, optional): Output length in seconds (default: length of the audio)
+            audio_args (list, optional): ffmpeg audio encoder arguments (default: AAC at 192k)
+        """
+        duration = duration or media_duration(audio_path)
+        audio_args = audio_args or RenderSettings().audio_args()
+        repeats = max(1, math.ceil(duration / unit_duration))
+        list_path = self.output_dir / f".concat_{uuid.uuid4().hex}.txt"
+        try:
+            list_path.write_text(_concat_line(unit_path) * repeats, encoding="utf-8")
+            run_ffmpeg([
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                "-i", audio_path,
+                "-map", "0:v:0", "-map", "1:a:0",
+                "-c:v", "copy", *audio_args,
+                "-t", f"{duration:.3f}",
+                "-movflags", "+faststart",
+                output_path
+            ])
+        finally:
+            if list_path.exists():
+                list_path.unlink()
+
+    def create_video_with_audio(self, video_path, audio_path, output_path=None, fast=True, loop="ping_pong",
+                                crossfade=0.0, captions=None, caption_timings=None):
         """
         Create a video with audio, using reversed video effect
-        
+
+        The fast path encodes one forward+reverse loop unit and stream copies
+        it to the length of the audio, so render time depends on the source
+        clip rather than the narration. `fast=False` encodes every output
+        frame in a single piped ffmpeg pass instead, see encode_timeline().
+
         Args:
             video_path (str): Path to input video
             audio_path (str): Path to audio file
             output_path (str, optional): Path for output video
-        
+            fast (bool): Encode the loop once and extend it by stream copy (default: True)
+            loop (str): Loop mode, "ping_pong" or "seamless", see RenderPlan
+            crossfade (float): Seconds blended across the seam of a seamless loop (default: 0)
+            captions (str, optional): Poem text to burn into the video, see RenderPlan
+            caption_timings (list, optional): (chunk text, seconds) pairs from tts.speech_timings()
+
         Returns:
             str: Path to the created video
         """
-        try:
-            if output_path is None:
-                output_path = str(self.output_dir / "final_video.mp4")
-            
-            # Create reversed video
-            reversed_path = str(self.output_dir / "temp_reversed.mp4")
-            self.reverse_video(video_path, reversed_path)
-            
-            # Load videos and audio
-            original_video = VideoFileClip(video_path)
-            reversed_video = VideoFileClip(reversed_path)
-            audio = AudioFileClip(audio_path)
-            
-            # Combine videos
-            combined_video = concatenate_videoclips([original_video, reversed_video])
-            
-            # Create final video matching audio duration
-            clips = []
-            current_duration = 0
-            while current_duration < audio.duration:
-                clips.append(combined_video)
-                current_duration += combined_video.duration
-
-            final_video = concatenate_videoclips(clips).set_duration(audio.duration)
-            final_video = final_video.set_audio(audio)
-
-            # Export
+        if output_path is None:
+            output_path = str(self.output_dir / "final_video.mp4")
+        plan = self.plan(video_path, audio_path, loop, crossfade, captions, caption_timings)
+        return self.render(plan, output_path=output_path, direct=not fast)
+
+    def plan(self, video_path, audio_path, loop="ping_pong", crossfade=0.0, captions=None, caption_timings=None):
+        """
+        Start a render of a video/audio pair; see preview() and finalize()
+
+        Args:
+            video_path (str): Path to input video
+            audio_path (str): Path to audio file
+            loop (str): Loop mode, "ping_pong" or "seamless", see RenderPlan
+            crossfade (float): Seconds blended across the seam of a seamless loop (default: 0)
+            captions (str, optional): Poem text to burn into the video, see RenderPlan
+            caption_timings (list, optional): (chunk text, seconds) pairs from tts.speech_timings()
+
+        Returns:
+            RenderPlan: Plan to pass to render(), preview() or finalize()
+        """
+        return RenderPlan(video_path, audio_path, loop, crossfade, captions, caption_timings)
+
+    def preview(self, plan, output_path=None, max_duration=None):
+        """
+        Render a quick low-resolution draft of a plan
+
+        Args:
+            plan (RenderPlan): Plan from plan()
+            output_path (str, optional): Path for the draft (default: output/preview_video.mp4)
+            max_duration (float, optional): Only render the first this many seconds
+
+        Returns:
+            str: Path to the draft video
+        """
+        output_path = output_path or str(self.output_dir / "preview_video.mp4")
+        return self.render(plan, RenderSettings.preview(max_duration=max_duration), output_path)
+
+    def finalize(self, plan, output_path=None):
+        """
+        Render a plan at full quality, reusing decisions made for its preview
+
+        Args:
+            plan (RenderPlan): Plan from plan(), usually already previewed
+            output_path (str, optional): Path for the video (default: output/final_video.mp4)
+
+        Returns:
+            str: Path to the final video
+        """
+        return self.render(plan, RenderSettings(), output_path)
+
+    def render(self, plan, settings=None, output_path=None, direct=False):
+        """
+        Encode the loop unit of a plan and extend it to the audio by stream copy
+
+        Args:
+            plan (RenderPlan): Plan from plan()
+            settings (RenderSettings, optional): Output quality (default: full quality)
+            output_path (str, optional): Path for output video (default: output/final_video.mp4)
+            direct (bool): Encode the whole timeline in one pass instead, see encode_timeline();
+                always the case for plans with captions, which change along the timeline
+
+        Returns:
+            str: Path to the rendered video
+        """
+        settings = settings or RenderSettings()
+        output_path = output_path or str(self.output_dir / "final_video.mp4")
+        direct = direct or plan.captions is not None
+        unit_path = self.output_dir / f".loop_unit_{uuid.uuid4().hex}.mp4"
+        video_digest = self._digest(plan.video_path)
+        duration = plan.duration(settings)
+        # The video track does not depend on the narration, only on how long it is and on
+        # the caption timing
+        track_key = ("video_track", video_digest, plan.loop_key(), plan.caption_key(), direct, settings.video_key())
+
+        def build(path):
+            track_path = self._video_track(track_key, duration)
+            if track_path is not None:
+                print("Reusing rendered video track, muxing new audio...")
+                self.mux_audio(track_path, plan.audio_path, path, duration, settings.audio_args())
+                return
+
+            if direct:
+                print("Encoding final video...")
+                self.encode_timeline(plan, path, settings)
+                return
+
+            # The loop unit only depends on the clip and the video settings, so it
+            # is shared by renders with different narrations
+            print("Encoding loop unit...")
+            self._artifact(
+                ("loop_unit", video_digest, plan.loop_key(), settings.video_key()),
+                str(unit_path),
+                lambda unit: self.encode_loop_unit(plan.video_path, unit, settings=settings, plan=plan)
+            )
             print("Exporting final video...")
-            final_video.write_videofile(
+            self.loop_to_audio(str(unit_path), media_duration(unit_path), plan.audio_path, path,
+                               duration=duration, audio_args=settings.audio_args())
+
+        try:
+            output_path, cached = self._artifact(
+                ("render", video_digest, self._digest(plan.audio_path), plan.loop_key(), plan.caption_key(), direct,
+                 settings.key()),
                 output_path,
-                codec="libx264",
-                audio_codec="aac",
-                verbose=False,
-                logger=None
+                build
             )
-            
-            # Cleanup
-            original_video.close()
-            reversed_video.close()
-            audio.close()
-            final_video.close()
-            if Path(reversed_path).exists():
-                Path(reversed_path).unlink()
-                
+            if cached:
+                print(f"Using cached render for {output_path}")
+            else:
+                self._remember_track(track_key, output_path, duration)
             return output_path
-            
+
         except Exception as e:
-            raise Exception(f"Failed to create video with audio: {str(e)}")
+            raise Exception(f"Failed to render video: {str(e)}")
+        finally:
+            if unit_path.exists():
+                unit_path.unlink()